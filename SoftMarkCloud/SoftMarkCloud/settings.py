@@ -138,3 +138,34 @@ REST_FRAMEWORK = {
 
 LOGIN_URL = 'login'
 
+# Profile every background collection, billing and deploy run with cProfile.
+# Staff users can also profile a single run with `?profile` query flag
+PROFILE_BACKGROUND_PROCESSES = False
+
+# Per service options of clients used by collector. S3 buckets list up to `contents_limit` largest objects.
+# Summary mode ('summary': True) takes bucket sizes from CloudWatch metrics instead of listing every object,
+# buckets with metrics list no objects at all unless `contents_limit` is set
+AWS_CLIENT_OPTIONS = {
+    's3': {'summary': False, 'contents_limit': 100},
+}
+
+# Codec of cached data and process details: json, zlib, lzma or msgpack (if installed).
+# Payloads smaller than PAYLOAD_COMPRESS_MIN_SIZE bytes are stored as compact JSON
+PAYLOAD_CODEC = 'zlib'
+PAYLOAD_COMPRESS_MIN_SIZE = 1024
+
+# Cache holds versions of cached data and process statuses. Background processes invalidate them, so it must be
+# shared between processes (file based, redis or memcached), not local memory
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Max size in bytes of decoded data and statuses kept in memory of every process, shared by all read caches
+READ_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+# Token of Prometheus scraper, sent as `Authorization: Bearer <token>`. Metrics are only exposed to staff users
+# when it's not set
+METRICS_TOKEN = None
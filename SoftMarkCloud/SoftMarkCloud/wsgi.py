@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SoftMarkCloud.settings')
 
 application = get_wsgi_application()
+
+# Metrics of calls made by web process are flushed in background, not on scrape
+from soft_mark_cloud.cloud.metrics import MetricsRegistry  # noqa: E402, apps must be loaded first
+
+MetricsRegistry.start_flusher()
@@ -1,3 +1,44 @@
+import io
+import zipfile
+
 from django.contrib import admin
+from django.http import HttpResponse
+
+from soft_mark_cloud.models import AWSProcessProfile
+
+
+@admin.register(AWSProcessProfile)
+class AWSProcessProfileAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'process_name', 'duration', 'created_at')
+    list_filter = ('process_name',)
+    list_select_related = ('user',)
+    readonly_fields = ('user', 'process_name', 'status', 'duration', 'created_at', 'summary')
+    exclude = ('stats',)
+    actions = ('download_stats',)
+
+    @staticmethod
+    def stats_filename(obj: AWSProcessProfile) -> str:
+        return f'{obj.process_name}-{obj.user_id}-{obj.created_at:%Y%m%d%H%M%S}.prof'
+
+    @admin.action(description='Download pstats dumps')
+    def download_stats(self, request, queryset):
+        """
+        Downloads single dump as is, several dumps are zipped. Dumps are loaded with `pstats.Stats(path)`
+        """
+        profiles = list(queryset)
+        if len(profiles) == 1:
+            response = HttpResponse(bytes(profiles[0].stats), content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="{self.stats_filename(profiles[0])}"'
+            return response
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for profile in profiles:
+                archive.writestr(self.stats_filename(profile), bytes(profile.stats))
+
+        response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="profiles.zip"'
+        return response
 
-# Register your models here.
+    def has_add_permission(self, request):
+        return False
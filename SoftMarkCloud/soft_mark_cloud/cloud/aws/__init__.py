@@ -1,4 +1,3 @@
-import django; django.setup()  # needed for multiprocessing
 from .core import *
 from .services.pricing import *
 from .services.ec2 import *
@@ -1,5 +1,3 @@
-import multiprocessing
-
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 from datetime import datetime
@@ -8,13 +6,19 @@ from soft_mark_cloud.cloud.aws import AWSCreds
 from soft_mark_cloud.cloud.aws.services.ec2 import EC2Client
 from soft_mark_cloud.cloud.aws.services.s3 import S3Client
 from soft_mark_cloud.cloud.aws.services.cost_explorer import CostExplorerClient
-from soft_mark_cloud.cloud.aws.status import AWSStatusDao
-from soft_mark_cloud.models import User
+from soft_mark_cloud.cloud.aws.jobs import AWSJobQueue
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao, AWSStatusHeartbeat
+from soft_mark_cloud.cloud.aws.profiling import AWSProcessProfiler
+from soft_mark_cloud.cloud.metrics import MetricsRegistry, collection_run_duration
+from soft_mark_cloud.models import AWSProcessStatus, User
 
 
 class AWSBilling:
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     process_name = 'aws_billing'
+    job_max_attempts = 2  # queued job attempts
+    default_cost = 10  # estimated seconds of the first run
+    max_runtime = 10 * 60  # seconds, longer run is taken for hung one
 
     def __init__(self, creds: AWSCreds):
         self.creds = creds
@@ -105,16 +109,30 @@ class AWSBilling:
             'next_month_prediction': round(ec2_price_per_month + s3_price_per_month, 2)
         }
 
-    def run(self, user: User):
+    def start_status(self, user: User) -> AWSProcessStatus:
+        """
+        Creates status of new run, previous billing data is shown until new one is built
+        """
         previous_status = AWSStatusDao.get_status(user, self.process_name)
         details = previous_status.details if previous_status else self.empty_billing_data
-
-        status = AWSStatusDao.create_status(user=user, process_name=self.process_name, details=details)
-
-        billing_data = self.build_billing_data()
-
-        AWSStatusDao.update_status_details(status, details=billing_data)
-        AWSStatusDao.update_status_state(status, done=True)
-
-    def run_async(self, user: User):
-        multiprocessing.Process(target=self.run, args=(user,)).start()
+        return AWSStatusDao.create_status(user=user, process_name=self.process_name, details=details)
+
+    def run(self, user: User, profile: bool = None, status: AWSProcessStatus = None):
+        try:
+            with collection_run_duration.time(process=self.process_name):
+                with AWSProcessProfiler.profile(user, self.process_name, enabled=profile):
+                    status = status or self.start_status(user)
+
+                    with AWSStatusHeartbeat(status, max_runtime=self.max_runtime):
+                        billing_data = self.build_billing_data()
+
+                    AWSStatusDao.update_status_details(status, details=billing_data)
+                    AWSStatusDao.update_status_state(status, done=True)
+        finally:
+            MetricsRegistry.flush()
+
+    def run_async(self, user: User, profile: bool = None, priority: str = AWSJobQueue.Priority.INTERACTIVE):
+        # Status is created before returning, so caller sees refreshing right away
+        AWSJobQueue.enqueue(
+            user, self.process_name, lambda: self.start_status(user), profile=profile,
+            max_attempts=self.job_max_attempts, priority=priority, default_cost=self.default_cost)
@@ -1,6 +1,79 @@
-from soft_mark_cloud.models import AWSCloudData
+import json
+from typing import Iterable, List, Optional, Tuple, Union
+
+from soft_mark_cloud.models import AWSCloudData, User
 from soft_mark_cloud.cloud.cache import CloudCache
+from soft_mark_cloud.cloud.aws.inventory import AWSInventoryDao
 
 
 class AWSCache(CloudCache):
+    """
+    AWS data is stored in normalized inventory, so slices are loaded without decoding whole account data.
+    Legacy data blob is read only until first save to inventory
+    """
     CacheModel = AWSCloudData
+
+    @classmethod
+    def save_cache(cls, user: User, data: Union[str, dict]):
+        if isinstance(data, str):
+            data = json.loads(data)
+        AWSInventoryDao.save_data(user, data)
+        super().clear_cache(user)
+        cls.invalidate(user)
+
+    @classmethod
+    def migrate_legacy_cache(cls, user: User):
+        """
+        Moves legacy data blob to inventory
+        """
+        if cache := cls.get_cache(user):
+            AWSInventoryDao.save_data(user, cache.data)
+            cache.delete()
+
+    @classmethod
+    def save_service(cls, user: User, region: Optional[str], service_item: dict):
+        """
+        Saves single collected (region, service), other services are kept as is
+        """
+        cls.migrate_legacy_cache(user)
+        AWSInventoryDao.save_service(user, region, service_item)
+        cls.invalidate(user)
+
+    @classmethod
+    def retain_services(cls, user: User, services: Iterable[Tuple[Optional[str], str]]):
+        AWSInventoryDao.retain_services(user, services)
+        cls.invalidate(user)
+
+    @classmethod
+    def clear_cache(cls, user: User):
+        AWSInventoryDao.clear(user)
+        super().clear_cache(user)
+        cls.invalidate(user)
+
+    @classmethod
+    def get_regions(cls, user: User) -> List[str]:
+        regions = cls.read_cache.get(
+            cls.get_group(user), 'regions', lambda: (AWSInventoryDao.get_regions(user), 1024))
+        return list(regions)
+
+    @classmethod
+    def get_cache_data_json(cls, user: User, region: str = None, service_name: str = None) -> Optional[str]:
+        if data := cls.get_cache_data(user, region, service_name):
+            return json.dumps(data, indent=4)
+        return 'No data'
+
+    @classmethod
+    def _load_slice(cls, user: User, region: Optional[str], service_name: Optional[str]):
+        data, size = AWSInventoryDao.get_data_sized(user, region, service_name)
+        if not data and region is None and service_name is None:
+            return cls._load_cache_data(user)
+        return data, size
+
+    @classmethod
+    def get_cache_data(cls, user: User, region: str = None, service_name: str = None) -> dict:
+        """
+        Gets AWS data of specified region (`global` for global services) and service, all data by default.
+        Unchanged data is read from memory and is shared, don`t mutate it
+        """
+        return cls.read_cache.get(
+            cls.get_group(user), ('data', region, service_name), lambda: cls._load_slice(user, region, service_name))
@@ -1,10 +1,78 @@
-import multiprocessing
+import copy
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
 
-from soft_mark_cloud.models import User
+from logging import getLogger
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Type
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from soft_mark_cloud.models import AWSProcessStatus, User
 from soft_mark_cloud.cloud.aws.cache import AWSCache
-from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+from soft_mark_cloud.cloud.aws.inventory import AWSInventoryDao
+from soft_mark_cloud.cloud.aws.jobs import AWSJobQueue
+from soft_mark_cloud.cloud.aws.snapshots import AWSSnapshotDao
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao, AWSStatusHeartbeat
+from soft_mark_cloud.cloud.aws.units import AWSUnitDao
+from soft_mark_cloud.cloud.aws.profiling import AWSProcessProfiler
+from soft_mark_cloud.cloud.aws.regions import AWSRegionDiscovery
 from soft_mark_cloud.cloud.core import CloudCollector
-from soft_mark_cloud.cloud.aws.core import AWSCreds, AWSRegionalClient, AWSGlobalClient
+from soft_mark_cloud.cloud.metrics import MetricsRegistry, collection_run_duration
+from soft_mark_cloud.cloud.aws.core import AWSCreds, AWSClient, AWSRegionalClient, AWSGlobalClient
+
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class CollectionUnit:
+    """
+    Single (region, service) piece of collection work. Global services have no region
+    """
+    client_cls: Type[AWSClient]
+    region: Optional[str] = None
+
+    @property
+    def service_name(self) -> str:
+        return self.client_cls.service_name
+
+    @property
+    def key(self) -> str:
+        return f'{self.region or "global"}:{self.service_name}'
+
+    def make_client(self, credentials: AWSCreds, **options) -> AWSClient:
+        if self.region is None:
+            return self.client_cls(credentials, **options)
+        return self.client_cls(credentials, self.region, **options)
+
+
+@dataclass
+class CollectionResult:
+    """
+    Outcome of a single collection unit
+    """
+    unit: CollectionUnit
+    data: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 1
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    @property
+    def json(self) -> dict:
+        return {
+            'region': self.unit.region,
+            'service': self.unit.service_name,
+            'error': self.error,
+            'attempts': self.attempts
+        }
 
 
 class AWSCollector(CloudCollector):
@@ -24,6 +92,9 @@ class AWSCollector(CloudCollector):
         All collected data from AWS
     """
     process_name = 'AWS_data_collecting'
+    job_max_attempts = 3  # queued job attempts, retries resume from checkpoints
+    default_cost = 60  # estimated seconds of the first run
+    max_runtime = 60 * 60  # seconds, longer run is taken for hung one
 
     all_regions = ['us-east-1', 'us-east-2', 'us-west-1', 'us-west-2', 'ap-south-1', 'ap-northeast-2', 'ap-northeast-3',
                    'ap-southeast-1', 'ap-southeast-2', 'ca-central-1', 'eu-central-1', 'eu-west-1', 'eu-west-2',
@@ -36,34 +107,361 @@ class AWSCollector(CloudCollector):
         'global': []
     }
 
-    def __init__(self, credentials: AWSCreds):
+    max_workers = 16  # global limit of simultaneously collected units
+    service_limits = {  # per service limits of simultaneously collected units
+        'ec2': 8,
+        's3': 1,
+    }
+    client_options = {  # per service clients options, overridden by `AWS_CLIENT_OPTIONS` setting
+        's3': {'contents_limit': 100},
+    }
+
+    unit_max_attempts = 3  # per unit attempts within single run
+    retry_backoff = 2  # seconds before the first retry, doubled on every next one
+
+    # Threads of async collection are shared by all collectors of process, so concurrent accounts don't cost
+    # `max_workers` threads each
+    _async_executor: Optional[ThreadPoolExecutor] = None
+    _async_executor_lock = threading.Lock()
+
+    def __init__(
+            self, credentials: AWSCreds, parallel: bool = True, max_workers: int = None,
+            service_limits: Dict[str, int] = None, discover_regions: bool = True, interactive: bool = False
+    ):
         self.credentials = credentials
+        self.parallel = parallel
+        self.discover_regions = discover_regions
+        self.interactive = interactive
+        self.max_workers = max_workers or self.max_workers
+        self.service_limits = {**self.service_limits, **(service_limits or {})}
+        self.client_options = {**self.client_options, **getattr(settings, 'AWS_CLIENT_OPTIONS', {})}
+        self.failures: List[CollectionResult] = []
+
+        self._semaphores_lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    @classmethod
+    def get_empty_data(cls) -> dict:
+        """
+        Gets fresh copy of empty collected data structure
+        """
+        return copy.deepcopy(cls.empty_data)
+
+    @staticmethod
+    def is_collectable(client_cls: Type[AWSClient]) -> bool:
+        """
+        Checks whether client implements resources collecting
+        """
+        return client_cls.collect_resources is not AWSClient.collect_resources \
+            or client_cls.collect_all is not AWSClient.collect_all
+
+    def get_regions(self) -> List[str]:
+        """
+        Gets regions to collect. Empty and inaccessible regions are skipped if discovery is enabled, interactive
+        refresh probes them again sooner
+        """
+        if not self.discover_regions:
+            return self.all_regions
 
-    def collect_all(self) -> dict:
-        res = self.empty_data
+        discovery = AWSRegionDiscovery(self.credentials, interactive=self.interactive)
+        return discovery.get_active_regions(discovery.discover_regions(fallback=self.all_regions))
 
-        for region in self.all_regions:
+    def get_units(self) -> List[CollectionUnit]:
+        """
+        Gets all (region, service) units to collect
+        """
+        units = []
+        for region in self.get_regions():
             for regional_client_cls in AWSRegionalClient.__subclasses__():
-                regional_client = regional_client_cls(self.credentials, region)
-                try:
-                    res['regional'][region].append(regional_client.collect_all())
-                except NotImplementedError:
-                    pass
+                if self.is_collectable(regional_client_cls):
+                    units.append(CollectionUnit(regional_client_cls, region))
 
         for global_client_cls in AWSGlobalClient.__subclasses__():
-            global_client = global_client_cls(self.credentials)
-            try:
-                res['global'].append(global_client.collect_all())
-            except NotImplementedError:
-                pass
+            if self.is_collectable(global_client_cls):
+                units.append(CollectionUnit(global_client_cls))
+
+        return units
+
+    def _get_semaphore(self, service_name: str) -> Optional[threading.BoundedSemaphore]:
+        if (limit := self.service_limits.get(service_name)) is None:
+            return None
+
+        with self._semaphores_lock:
+            if service_name not in self._semaphores:
+                self._semaphores[service_name] = threading.BoundedSemaphore(limit)
+            return self._semaphores[service_name]
+
+    def _collect_unit(self, unit: CollectionUnit) -> CollectionResult:
+        try:
+            client = unit.make_client(self.credentials, **self.client_options.get(unit.service_name, {}))
+            return CollectionResult(unit, data=client.collect_all())
+        except NotImplementedError:
+            return CollectionResult(unit)
+        except Exception as e:
+            logger.exception(f"Collecting {unit.key} failed")
+            return CollectionResult(unit, error=f'{e.__class__.__name__}: {e}')
+
+    @staticmethod
+    def _in_worker_thread(
+            collect: Callable[[CollectionUnit], CollectionResult], unit: CollectionUnit
+    ) -> CollectionResult:
+        try:
+            return collect(unit)
+        finally:
+            # Clients may touch db (prices cache), don't leak connections of pool threads. Caller's own
+            # connection is never closed, it may be inside transaction
+            connections.close_all()
+
+    def collect_unit(self, unit: CollectionUnit) -> CollectionResult:
+        """
+        Collects single unit. Errors are reported in result instead of being raised
+        """
+        semaphore = self._get_semaphore(unit.service_name) if self.parallel else None
+        if semaphore:
+            semaphore.acquire()
+        try:
+            return self._collect_unit(unit)
+        finally:
+            if semaphore:
+                semaphore.release()
+
+    def iter_results(self, units: List[CollectionUnit]) -> Iterator[CollectionResult]:
+        """
+        Collects units yielding results as soon as they are completed
+        """
+        if not self.parallel:
+            for unit in units:
+                yield self.collect_unit(unit)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._in_worker_thread, self.collect_unit, unit) for unit in units]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @classmethod
+    def get_async_executor(cls) -> ThreadPoolExecutor:
+        with cls._async_executor_lock:
+            if AWSCollector._async_executor is None:
+                AWSCollector._async_executor = ThreadPoolExecutor(
+                    max_workers=AWSCollector.max_workers, thread_name_prefix='aws-collector')
+            return AWSCollector._async_executor
+
+    async def collect_all_async(self) -> AsyncIterator[CollectionResult]:
+        """
+        Collects all units on the running event loop yielding results as soon as they are completed.
+        Blocking boto3 calls are run in thread pool shared by all collectors of process, units of this collector
+        take up to `max_workers` of its threads
+
+        Examples
+        --------
+        >>> async for result in AWSCollector(creds).collect_all_async():
+        ...     print(result.unit.key, result.failed)
+        """
+        loop = asyncio.get_running_loop()
+        service_semaphores = {
+            name: asyncio.Semaphore(limit) for name, limit in self.service_limits.items()}
+        default_semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def _collect(unit_: CollectionUnit) -> CollectionResult:
+            async with service_semaphores.get(unit_.service_name, default_semaphore):
+                return await loop.run_in_executor(executor, self._in_worker_thread, self._collect_unit, unit_)
+
+        executor = self.get_async_executor()
+        units = await loop.run_in_executor(executor, self.get_units)  # touches db, can't run in event loop
+        tasks = [asyncio.ensure_future(_collect(unit)) for unit in units]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # Units not started yet are dropped from shared pool, started ones finish in background
+            for task in tasks:
+                task.cancel()
+
+    async def collect_data_async(self) -> dict:
+        """
+        Async version of `collect_all`
+        """
+        res = self.get_empty_data()
+        self.failures = []
+
+        async for result in self.collect_all_async():
+            if result.failed:
+                self.failures.append(result)
+            self.merge_result(res, result)
+
+        return res
+
+    @staticmethod
+    def replace_result(data: dict, result: CollectionResult) -> dict:
+        """
+        Replaces service entry of unit region with unit result. Entry is kept as is if unit has failed
+        """
+        if result.data is None:
+            return data
+
+        if result.unit.region is None:
+            entries = data.setdefault('global', [])
+        else:
+            entries = data.setdefault('regional', {}).setdefault(result.unit.region, [])
+
+        for i, entry in enumerate(entries):
+            if entry.get('name') == result.data.get('name'):
+                entries[i] = result.data
+                return data
+        entries.append(result.data)
+        return data
+
+    @staticmethod
+    def merge_result(data: dict, result: CollectionResult) -> dict:
+        """
+        Merges unit result into collected data
+        """
+        if result.data is None:
+            return data
+
+        if result.unit.region is None:
+            data['global'].append(result.data)
+        else:
+            data['regional'].setdefault(result.unit.region, []).append(result.data)
+        return data
+
+    def collect_all(self, on_result: Callable[[CollectionResult, int, int], None] = None) -> dict:
+        """
+        Collects all units. `on_result` is called with (result, completed units, total units) as soon as
+        every unit is completed
+        """
+        res = self.get_empty_data()
+        self.failures = []
+
+        units = self.get_units()
+        results: Dict[str, CollectionResult] = {}
+        for completed, result in enumerate(self.iter_results(units), start=1):
+            if result.failed:
+                self.failures.append(result)
+            results[result.unit.key] = result
+            if on_result:
+                on_result(result, completed, len(units))
+
+        # Merge in units order to keep output stable
+        for unit in units:
+            self.merge_result(res, results[unit.key])
 
         return res
 
-    def run(self, user: User):
-        status = AWSStatusDao.create_status(user=user, process_name=self.process_name)
-        aws_data = self.collect_all()
+    def collect_checkpointed(
+            self, status: AWSProcessStatus, on_result: Callable[[CollectionResult, int, int], None] = None
+    ) -> dict:
+        """
+        Collects all units checkpointing every unit result. Units completed by previous interrupted run of
+        the same status are not collected again. Failed units are retried with exponential backoff
+        """
+        res = self.get_empty_data()
+        self.failures = []
+
+        units = self.get_units()
+        rows = AWSUnitDao.sync_units(status, units)
+
+        pending = [unit for unit in units if rows[unit.key].state != AWSUnitDao.State.DONE]
+        completed = len(units) - len(pending)
+
+        attempt = 0
+        while pending:
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            AWSUnitDao.mark_running(rows[unit.key] for unit in pending)
+
+            retry = []
+            for result in self.iter_results(pending):
+                row = AWSUnitDao.finish(rows[result.unit.key], result)
+                result.attempts = row.attempts
+                if result.failed and row.attempts < self.unit_max_attempts:
+                    logger.info(f"Unit {result.unit.key} will be retried, attempt {row.attempts} failed")
+                    retry.append(result.unit)
+                    continue
+
+                if result.failed:
+                    self.failures.append(result)
+                completed += 1
+                if on_result:
+                    on_result(result, completed, len(units))
+
+            pending, attempt = retry, attempt + 1
+
+        # Merge in units order to keep output stable
+        for unit in units:
+            self.merge_result(res, CollectionResult(unit, data=rows[unit.key].data))
+
+        return res
+
+    def get_progress_details(self, completed: int, total: Optional[int]) -> dict:
+        return {
+            'progress': {
+                'completed': completed,
+                'total': total,
+                'failed': len(self.failures)
+            },
+            'failures': [f.json for f in self.failures]
+        }
+
+    def get_resumable_status(self, user: User) -> Optional[AWSProcessStatus]:
+        """
+        Gets status of previous run if it was interrupted before all units were completed. Only runs started
+        within time all job attempts may take are resumed, units of older ones are too stale to be merged with
+        """
+        status = AWSStatusDao.get_status(user, self.process_name)
+        if status is None or status.done:
+            return None
+        resumable_since = datetime.now(tz=timezone.utc) - timedelta(seconds=self.max_runtime * self.job_max_attempts)
+        if status.created_at >= resumable_since and AWSUnitDao.has_unfinished(status):
+            return status
+        return None
+
+    def start_status(self, user: User) -> AWSProcessStatus:
+        """
+        Resumes status of interrupted previous run or creates new one
+        """
+        if status := self.get_resumable_status(user):
+            logger.info(f"Resuming interrupted {self.process_name} of {user}")
+            AWSUnitDao.reset_unfinished(status)
+            return AWSStatusDao.reset_status_state(status, details=self.get_progress_details(0, None))
+
+        return AWSStatusDao.create_status(
+            user=user, process_name=self.process_name, details=self.get_progress_details(0, None))
+
+    def collect_to_cache(self, user: User, status: AWSProcessStatus):
+        # Previous data is replaced unit by unit, so partial inventory is available right away
+        def _publish(result: CollectionResult, completed: int, total: int):
+            if result.data is not None:
+                AWSCache.save_service(user, result.unit.region, result.data)
+            AWSStatusDao.update_status_details(status, self.get_progress_details(completed, total))
+
+        aws_data = self.collect_checkpointed(status, on_result=_publish)
+
+        # Drop regions and services which are no longer collected, collected ones are already saved unit by unit.
+        # Services of failed units keep previously collected resources
+        retained = [(region, service_item['name']) for region, service_item in AWSInventoryDao.iter_services(aws_data)]
+        retained += [(failure.unit.region, failure.unit.service_name) for failure in self.failures]
+        AWSCache.retain_services(user, retained)
+        try:
+            AWSSnapshotDao.take_snapshot(user)
+        except DatabaseError:
+            logger.exception(f"Taking inventory snapshot of {user} failed")
         AWSStatusDao.update_status_state(status, done=True)
-        AWSCache.save_cache(user, aws_data)
+        AWSUnitDao.clear_data(status)  # done runs are never resumed
+
+    def run(self, user: User, profile: bool = None, status: AWSProcessStatus = None):
+        try:
+            with collection_run_duration.time(process=self.process_name):
+                with AWSProcessProfiler.profile(user, self.process_name, enabled=profile):
+                    status = status or self.start_status(user)
+                    with AWSStatusHeartbeat(status, max_runtime=self.max_runtime):
+                        self.collect_to_cache(user, status)
+        finally:
+            MetricsRegistry.flush()
 
-    def run_async(self, user: User):
-        multiprocessing.Process(target=self.run, args=(user, )).start()
+    def run_async(self, user: User, profile: bool = None, priority: str = AWSJobQueue.Priority.INTERACTIVE):
+        # Status is started before returning, so caller sees refreshing right away
+        AWSJobQueue.enqueue(
+            user, self.process_name, lambda: self.start_status(user), profile=profile,
+            max_attempts=self.job_max_attempts, priority=priority, default_cost=self.default_cost)
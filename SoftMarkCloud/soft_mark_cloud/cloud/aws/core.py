@@ -1,10 +1,17 @@
-import boto3
+import time
+import itertools
+import threading
+
+import jmespath
+from botocore.client import BaseClient
 from botocore.exceptions import ClientError
 
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from soft_mark_cloud.cloud.core import Credentials, CloudClient
+from soft_mark_cloud.cloud.aws.pool import AWSClientPool
+from soft_mark_cloud.cloud.metrics import Counter, Histogram
 from soft_mark_cloud.domain import DisplayItem, ItemsField
 from soft_mark_cloud.models import AWSCredentials
 
@@ -61,22 +68,220 @@ class AWSCreds(Credentials):
             aws_access_key_id=strip(self.aws_access_key_id),
             aws_secret_access_key=strip(self.aws_secret_access_key))
 
+    @property
+    def fingerprint(self) -> str:
+        return AWSClientPool.fingerprint(self.aws_access_key_id, self.aws_secret_access_key)
+
     @property
     def is_valid(self) -> bool:
-        sts_client = boto3.client(
-            'sts',
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key
-        )
+        sts_client = AWSClientPool.get_client(self, 'sts')
         try:
-            sts_client.get_caller_identity()
+            identity = sts_client.get_caller_identity()
+            AWSClientPool.set_account_id(self, identity['Account'])
             return True
         except ClientError:
             return False
 
-    def get_account_id(self):
-        sts_client = boto3.client('sts', **self.__dict__)
-        return sts_client.get_caller_identity()['Account']
+    def get_account_id(self) -> str:
+        return AWSClientPool.get_account_id(self)
+
+
+class AWSCallLimiter:
+    """
+    Limiter of AWS API calls to single (service, region).
+
+    Calls rate is limited by token bucket of `rate_limit` tokens per second. Number of simultaneous calls is
+    limited by AIMD: limit grows additively on every successful call and is cut multiplicatively on throttling.
+    """
+    increase_step = 1.0  # limit grows by one call per `limit` successful calls
+    decrease_factor = 0.5
+    min_concurrency = 1
+
+    def __init__(self, rate_limit: Optional[float], max_concurrency: int):
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+
+        self.capacity = max(1.0, rate_limit) if rate_limit else None
+        self.tokens = self.capacity
+        self.refilled_at = time.monotonic()
+
+        self._condition = threading.Condition()
+
+    def _take_token(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.rate_limit)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_limit
+            time.sleep(wait)
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.concurrency):
+                self._condition.wait()
+            self.in_flight += 1
+
+        if self.rate_limit:
+            self._take_token()
+
+    def release(self, throttled: Optional[bool]):
+        """
+        Releases call slot. `throttled` is None when outcome says nothing about service load (e.g. network error)
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+            elif throttled is not None:
+                self.concurrency = min(self.max_concurrency, self.concurrency + self.increase_step / self.concurrency)
+            self._condition.notify_all()
+
+
+class AWSRateController:
+    """
+    Shared throttling aware controller of AWS API calls.
+
+    Every pooled boto3 client goes through `AWSCallLimiter` of its (credentials, service, region) with botocore
+    `before-call`/`after-call` event handlers. Rate hints are declared by `AWSClient` subclasses with `rate_limit`
+    and `max_concurrency` attributes. Retries themselves are left to botocore adaptive retry mode, throttled
+    attempts are counted by `needs-retry` handler, so call which has succeeded after throttled retries cuts
+    concurrency too, while retries of other errors (e.g. 5xx, timeouts) don't.
+    """
+    default_max_concurrency = 10
+    throttling_codes = {
+        'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException', 'RequestThrottled',
+        'RequestLimitExceeded', 'TooManyRequestsException', 'SlowDown', 'ProvisionedThroughputExceededException',
+        'BandwidthLimitExceeded'
+    }
+    context_key = 'soft_mark_cloud_limiter'
+    throttles_key = 'soft_mark_cloud_throttles'
+
+    throttles = Counter(
+        'aws_api_throttles_total',
+        'Number of throttled AWS API call attempts, including retried ones')
+
+    rate_hints: Dict[str, Tuple[Optional[float], int]] = {}
+
+    _lock = threading.Lock()
+    _limiters: Dict[Tuple[str, str, Optional[str]], AWSCallLimiter] = {}
+
+    @classmethod
+    def set_rate_hint(cls, service_name: str, rate_limit: Optional[float], max_concurrency: Optional[int]):
+        cls.rate_hints[service_name] = (rate_limit, max_concurrency or cls.default_max_concurrency)
+
+    @classmethod
+    def get_limiter(cls, fingerprint: str, service_name: str, region_name: Optional[str]) -> AWSCallLimiter:
+        key = (fingerprint, service_name, region_name)
+        with cls._lock:
+            if (limiter := cls._limiters.get(key)) is None:
+                rate_limit, max_concurrency = cls.rate_hints.get(service_name, (None, cls.default_max_concurrency))
+                limiter = cls._limiters[key] = AWSCallLimiter(rate_limit, max_concurrency)
+            return limiter
+
+    @classmethod
+    def evict(cls, fingerprint: str):
+        """
+        Drops limiters of credentials dropped from client pool
+        """
+        with cls._lock:
+            for key in [key for key in cls._limiters if key[0] == fingerprint]:
+                del cls._limiters[key]
+
+    @classmethod
+    def is_throttled(cls, parsed: dict) -> bool:
+        return parsed.get('Error', {}).get('Code') in cls.throttling_codes
+
+    @classmethod
+    def instrument(cls, client: BaseClient, fingerprint: str, service_name: str, region_name: Optional[str]):
+        """
+        Registers limiter event handlers on boto3 client
+        """
+        limiter = cls.get_limiter(fingerprint, service_name, region_name)
+        region = region_name or client.meta.region_name or 'global'
+
+        def _before_call(context: dict, **kwargs):
+            limiter.acquire()
+            context[cls.context_key] = True
+            context[cls.throttles_key] = 0
+
+        def _needs_retry(response, request_dict: dict, **kwargs):
+            # Called for every attempt, the last one included. Returns None, so retry decision is left to botocore
+            if response is not None and cls.is_throttled(response[1]):
+                request_dict['context'][cls.throttles_key] = request_dict['context'].get(cls.throttles_key, 0) + 1
+                cls.throttles.inc(service=service_name, region=region)
+
+        def _after_call(context: dict, **kwargs):
+            # Calls answered by other before-call handlers (e.g. stubs) have never acquired a slot
+            if context.pop(cls.context_key, False):
+                limiter.release(throttled=context.pop(cls.throttles_key, 0) > 0)
+
+        def _after_call_error(context: dict, **kwargs):
+            if context.pop(cls.context_key, False):
+                limiter.release(throttled=True if context.pop(cls.throttles_key, 0) else None)
+
+        client.meta.events.register('before-call', _before_call)
+        client.meta.events.register('needs-retry', _needs_retry)
+        client.meta.events.register('after-call', _after_call)
+        client.meta.events.register('after-call-error', _after_call_error)
+
+
+AWSClientPool.register_client_hook(AWSRateController.instrument)
+AWSClientPool.register_eviction_hook(AWSRateController.evict)
+
+
+class AWSCallMetrics:
+    """
+    Times every AWS API call made by pooled clients into per (service, operation, region) metrics.
+    Time spent waiting for rate limiter slot is not included into call duration
+    """
+    context_key = 'soft_mark_cloud_started_at'
+
+    call_duration = Histogram(
+        'aws_api_call_duration_seconds',
+        'Duration of AWS API calls including botocore retries',
+        buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+    call_errors = Counter(
+        'aws_api_call_errors_total',
+        'Number of failed AWS API calls')
+
+    @classmethod
+    def instrument(cls, client: BaseClient, fingerprint: str, service_name: str, region_name: Optional[str]):
+        """
+        Registers timing event handlers on boto3 client
+        """
+        region = region_name or client.meta.region_name or 'global'
+
+        def _before_call(context: dict, **kwargs):
+            context[cls.context_key] = time.perf_counter()
+
+        def _after_call(http_response, parsed: dict, model, context: dict, **kwargs):
+            if (started_at := context.pop(cls.context_key, None)) is None:
+                return
+            labels = {'service': service_name, 'operation': model.name, 'region': region}
+            cls.call_duration.observe(time.perf_counter() - started_at, **labels)
+            if http_response.status_code >= 300:
+                error = parsed.get('Error', {}).get('Code') or str(http_response.status_code)
+                cls.call_errors.inc(error=error, **labels)
+
+        def _after_call_error(exception: Exception, context: dict, event_name: str, **kwargs):
+            if (started_at := context.pop(cls.context_key, None)) is None:
+                return
+            labels = {'service': service_name, 'operation': event_name.rsplit('.', 1)[-1], 'region': region}
+            cls.call_duration.observe(time.perf_counter() - started_at, **labels)
+            cls.call_errors.inc(error=exception.__class__.__name__, **labels)
+
+        client.meta.events.register('before-call', _before_call)
+        client.meta.events.register('after-call', _after_call)
+        client.meta.events.register('after-call-error', _after_call_error)
+
+
+AWSClientPool.register_client_hook(AWSCallMetrics.instrument)
 
 
 class AWSClient(CloudClient):
@@ -84,11 +289,51 @@ class AWSClient(CloudClient):
     AWS client abstract class
     """
     service_name = None
+    max_items: Dict[str, Optional[int]] = {}  # caps of iterated items per resource type, no cap by default
+
+    rate_limit: Optional[float] = None  # calls per second per region, not limited by default
+    max_concurrency: Optional[int] = None  # simultaneous calls per region
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.service_name:
+            AWSRateController.set_rate_hint(cls.service_name, cls.rate_limit, cls.max_concurrency)
 
-    def __init__(self, credentials: AWSCreds, **kwargs):
+    def __init__(self, credentials: AWSCreds, region_name: str = None):
         super().__init__(credentials)
-        self.boto3_client = boto3.client(self.service_name, **self.credentials.__dict__, **kwargs)
-        self.account_id = credentials.get_account_id()
+        self.boto3_client = AWSClientPool.get_client(credentials, self.service_name, region_name)
+
+    @property
+    def account_id(self) -> str:
+        return self.credentials.get_account_id()
+
+    def iter_items(
+            self, operation_name: str, expression: str, resource_type: str = None, page_size: int = None,
+            client: BaseClient = None, **kwargs
+    ) -> Iterator[dict]:
+        """
+        Iterates over items returned by list/describe API call.
+
+        Paginator is used if operation supports it, so pages are requested lazily and only one page is kept in
+        memory at once. Items are searched in every page with JMESPath `expression`. Number of items is capped by
+        `max_items` of specified `resource_type`. Client's own boto3 client is used unless other `client` specified
+
+        Examples
+        --------
+        >>> for instance in client.iter_items('describe_instances', 'Reservations[].Instances[]', 'instances'):
+        ...     print(instance['InstanceId'])
+        """
+        max_items = self.max_items.get(resource_type)
+        client = client or self.boto3_client
+
+        if client.can_paginate(operation_name):
+            pagination_config = {'PageSize': page_size} if page_size else {}
+            pages = client.get_paginator(operation_name).paginate(PaginationConfig=pagination_config, **kwargs)
+        else:
+            pages = iter([getattr(client, operation_name)(**kwargs)])
+
+        items = (item for page in pages for item in jmespath.search(expression, page) or [])
+        yield from itertools.islice(items, max_items)
 
     def collect_resources(self) -> List[AWSResource]:
         """
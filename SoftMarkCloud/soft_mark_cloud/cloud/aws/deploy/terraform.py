@@ -1,17 +1,18 @@
 import time
-import multiprocessing
 import os
 import subprocess
 from enum import Enum
 
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 
 from soft_mark_cloud.cloud.aws import EC2Client
-from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+from soft_mark_cloud.cloud.aws.jobs import AWSJobQueue
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao, AWSStatusHeartbeat
+from soft_mark_cloud.cloud.aws.profiling import AWSProcessProfiler
 from soft_mark_cloud.cloud.core import Deployer, DeploySettings
 from soft_mark_cloud.cloud.aws.core import AWSCreds
-from soft_mark_cloud.models import User
+from soft_mark_cloud.models import AWSProcessStatus, User
 
 
 @dataclass
@@ -36,6 +37,9 @@ class TerraformSettings(DeploySettings):
 
 class AWSDeployer(Deployer):
     process_name = 'terraform_deploying'
+    default_cost = 300  # estimated seconds of the first deploy
+    max_runtime = 30 * 60  # seconds, longer deploy is taken for hung one
+    init_timeout = 20 * 60  # seconds to wait for instance initialization
 
     class Steps(Enum):
         instance_generation = 'Generating instance ...'
@@ -173,9 +177,8 @@ output "public_ip" {{
         res = subprocess.run(["terraform", "output", 'instance_id'], cwd=self.tf_path, capture_output=True, text=True)
         return res.stdout.strip()[1:-1]
 
-    def deploy(self, user: User):
-        self.settings: TerraformSettings
-        details = {
+    def get_initial_details(self) -> dict:
+        return {
             'steps': {
                 self.Steps.instance_generation.value: False,
                 self.Steps.receiving_instance_data.value: False,
@@ -183,37 +186,57 @@ output "public_ip" {{
             },
             'url': None
         }
-        status = AWSStatusDao.create_status(user=user, process_name=self.process_name, details=details)
-
-        # Creating
-        self.create_instance()
-        details['steps'][self.Steps.instance_generation.value] = True
-        AWSStatusDao.update_status_details(status, details)
-
-        # Receiving data
-        public_ip = self.get_instance_public_ip()
-        instance_id = self.get_instance_id()
-        details['steps'][self.Steps.receiving_instance_data.value] = True
-        AWSStatusDao.update_status_details(status, details)
-
-        # Initializing
-        ec2_client = EC2Client(self.settings.creds, self.settings.region)
-        check_after = 10  # seconds
-        while True:
-            time.sleep(check_after)
 
-            if not ec2_client.get_ec2_instance(instance_id):
-                break
+    def start_status(self, user: User) -> AWSProcessStatus:
+        return AWSStatusDao.create_status(user=user, process_name=self.process_name, details=self.get_initial_details())
 
-            if ec2_client.check_ec2_instance_initialized(instance_id):
-                break
+    def deploy(self, user: User, profile: bool = None, status: AWSProcessStatus = None):
+        with AWSProcessProfiler.profile(user, self.process_name, enabled=profile):
+            self._deploy(user, status or self.start_status(user))
 
-        details['url'] = f"http://{public_ip}:8000"
-        details['steps'][self.Steps.instance_initialization.value] = True
-        AWSStatusDao.update_status_details(status, details)
-
-        # Completed
-        AWSStatusDao.update_status_state(status, done=True)
-
-    def deploy_async(self, user: User):
-        multiprocessing.Process(target=self.deploy, args=(user, )).start()
+    def _deploy(self, user: User, status: AWSProcessStatus):
+        self.settings: TerraformSettings
+        details = self.get_initial_details()
+
+        with AWSStatusHeartbeat(status, max_runtime=self.max_runtime):
+            # Creating
+            self.create_instance()
+            details['steps'][self.Steps.instance_generation.value] = True
+            AWSStatusDao.update_status_details(status, details)
+
+            # Receiving data
+            public_ip = self.get_instance_public_ip()
+            instance_id = self.get_instance_id()
+            details['steps'][self.Steps.receiving_instance_data.value] = True
+            AWSStatusDao.update_status_details(status, details)
+
+            # Initializing
+            ec2_client = EC2Client(self.settings.creds, self.settings.region)
+            check_after = 10  # seconds
+            deadline = time.monotonic() + self.init_timeout
+            while True:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'Instance {instance_id} is not initialized in {self.init_timeout}s')
+                time.sleep(check_after)
+
+                if not ec2_client.get_ec2_instance(instance_id):
+                    break
+
+                if ec2_client.check_ec2_instance_initialized(instance_id):
+                    break
+
+            details['url'] = f"http://{public_ip}:8000"
+            details['steps'][self.Steps.instance_initialization.value] = True
+            AWSStatusDao.update_status_details(status, details)
+
+            # Completed
+            AWSStatusDao.update_status_state(status, done=True)
+
+    def deploy_async(self, user: User, profile: bool = None):
+        # Status is created before returning, so caller sees deploy in progress right away. Credentials aren't
+        # queued, worker reads them from database
+        payload = {field.name: getattr(self.settings, field.name) for field in fields(self.settings)
+                   if field.name != 'creds'}
+        AWSJobQueue.enqueue(
+            user, self.process_name, lambda: self.start_status(user), payload=payload, profile=profile,
+            default_cost=self.default_cost, quota_exempt=True)
@@ -0,0 +1,313 @@
+import json
+import time
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from botocore.awsrequest import AWSResponse
+from botocore.client import BaseClient
+
+from soft_mark_cloud.cloud.aws.pool import AWSClientPool
+from soft_mark_cloud.cloud.aws.collector import AWSCollector
+
+
+@dataclass
+class SyntheticAccount:
+    """
+    Shape of synthetic AWS account. Resource counts are per parent resource
+    """
+    regions: int = 2
+    vpcs: int = 2  # per region
+    subnets: int = 2  # per VPC
+    instances: int = 5  # per subnet
+    buckets: int = 3
+    objects: int = 100  # per bucket
+
+    account_id: str = '123456789012'
+    instance_types: Tuple[str, ...] = ('t3.micro', 't3.large', 'm5.xlarge', 'c5.2xlarge')
+    all_regions: Tuple[str, ...] = tuple(AWSCollector.all_regions)
+
+    @property
+    def active_regions(self) -> Tuple[str, ...]:
+        return self.all_regions[:self.regions]
+
+    @property
+    def description(self) -> str:
+        return (f'{self.regions} regions x {self.vpcs} VPCs x {self.subnets} subnets x {self.instances} instances, '
+                f'{self.buckets} buckets x {self.objects} objects')
+
+
+class FakeAWS:
+    """
+    In-process stand-in for AWS API serving synthetic account.
+
+    Calls of pooled clients are answered by botocore `before-call` handler registered after rate limiter and
+    metrics handlers, so requests are validated, limited and timed as usual but never leave the process.
+    Every call sleeps `latency` (plus random `jitter`) seconds. Unsupported operations fail with
+    `UnsupportedOperation` error.
+
+    Examples
+    --------
+    >>> fake = FakeAWS(SyntheticAccount(regions=3, objects=10000), latency=0.02)
+    >>> with fake.install():
+    ...     data = AWSCollector(creds).collect_all()
+    >>> fake.calls.most_common(3)
+    """
+    default_page_size = 1000
+    context_key = 'soft_mark_cloud_fake_params'
+    created_at = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    prices = {'t3.micro': 0.0104, 't3.large': 0.0832, 'm5.xlarge': 0.192, 'c5.2xlarge': 0.34}
+    storage_price = 0.023
+
+    def __init__(self, account: SyntheticAccount, latency: float = 0.0, jitter: float = 0.0):
+        self.account = account
+        self.latency = latency
+        self.jitter = jitter
+
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._bucket_sizes: Dict[int, int] = {}
+
+        self.handlers: Dict[str, Callable[[str, dict], dict]] = {
+            'GetCallerIdentity': self.get_caller_identity,
+            'DescribeRegions': self.describe_regions,
+            'DescribeVpcs': self.describe_vpcs,
+            'DescribeSubnets': self.describe_subnets,
+            'DescribeInstances': self.describe_instances,
+            'GetProducts': self.get_products,
+            'ListBuckets': self.list_buckets,
+            'GetBucketLocation': self.get_bucket_location,
+            'ListObjectsV2': self.list_objects_v2,
+            'GetMetricData': self.get_metric_data,
+        }
+
+    @contextmanager
+    def install(self) -> Iterator['FakeAWS']:
+        """
+        Routes calls of all pooled clients to fake while in context
+        """
+        AWSClientPool.clear()
+        AWSClientPool.register_client_hook(self.instrument)
+        try:
+            yield self
+        finally:
+            AWSClientPool.unregister_client_hook(self.instrument)
+            AWSClientPool.clear()
+
+    def instrument(self, client: BaseClient, fingerprint: str, service_name: str, region_name: Optional[str]):
+        region = region_name or client.meta.region_name
+
+        def _before_parameter_build(params: dict, context: dict, **kwargs):
+            # `before-call` only gets serialized request, so API params are kept in context
+            context[self.context_key] = params
+
+        def _before_call(model, context: dict, **kwargs):
+            return self.handle(service_name, region, model.name, context.pop(self.context_key, {}))
+
+        client.meta.events.register_last('before-parameter-build', _before_parameter_build)
+        client.meta.events.register_last('before-call', _before_call)
+
+    def handle(self, service_name: str, region: str, operation_name: str, params: dict) -> Tuple[AWSResponse, dict]:
+        with self._lock:
+            self.calls[(service_name, operation_name)] += 1
+
+        if delay := self.latency + random.uniform(0, self.jitter):
+            time.sleep(delay)
+
+        if (handler := self.handlers.get(operation_name)) is None:
+            parsed = {
+                'Error': {'Code': 'UnsupportedOperation', 'Message': f'{operation_name} is not faked'},
+                'ResponseMetadata': {'HTTPStatusCode': 400, 'RetryAttempts': 0}}
+            return AWSResponse('https://fake.amazonaws.com', 400, {}, None), parsed
+
+        parsed = handler(region, params)
+        parsed['ResponseMetadata'] = {'HTTPStatusCode': 200, 'RetryAttempts': 0}
+        return AWSResponse('https://fake.amazonaws.com', 200, {}, None), parsed
+
+    def _page(
+            self, params: dict, total: int, make_item: Callable[[int], dict], token_param: str = 'NextToken',
+            limit_param: str = 'MaxResults'
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Gets page of items lazily built from their positions. Returns (items, next token)
+        """
+        start = int(params.get(token_param) or 0)
+        end = min(total, start + (params.get(limit_param) or self.default_page_size))
+        items = [make_item(i) for i in range(start, end)]
+        return items, str(end) if end < total else None
+
+    # Filters
+
+    @staticmethod
+    def _filter_values(params: dict, name: str) -> Optional[List[str]]:
+        for f in params.get('Filters', []):
+            if f['Name'] == name:
+                return f['Values']
+        return None
+
+    # STS
+
+    def get_caller_identity(self, region: str, params: dict) -> dict:
+        return {
+            'Account': self.account.account_id,
+            'Arn': f'arn:aws:iam::{self.account.account_id}:user/benchmark',
+            'UserId': 'AIDABENCHMARK'}
+
+    # EC2
+
+    def describe_regions(self, region: str, params: dict) -> dict:
+        return {'Regions': [
+            {'RegionName': r, 'Endpoint': f'ec2.{r}.amazonaws.com', 'OptInStatus': 'opt-in-not-required'}
+            for r in self.account.all_regions]}
+
+    def _region_vpcs(self, region: str, params: dict) -> List[int]:
+        if region not in self.account.active_regions:
+            return []
+        vpcs = range(self.account.vpcs)
+        if (vpc_ids := self._filter_values(params, 'vpc-id')) is not None:
+            vpcs = [v for v in vpcs if self._vpc_id(region, v) in vpc_ids]
+        if self._filter_values(params, 'is-default') == ['true']:
+            vpcs = []  # all synthetic VPCs are non default
+        return list(vpcs)
+
+    def _vpc_id(self, region: str, vpc: int) -> str:
+        return f'vpc-{self.account.active_regions.index(region):04x}{vpc:08x}'
+
+    def _subnet_id(self, region: str, vpc: int, subnet: int) -> str:
+        return f'subnet-{self._vpc_id(region, vpc)[4:]}{subnet:04x}'
+
+    def _instance_id(self, region: str, vpc: int, subnet: int, instance: int) -> str:
+        return f'i-{self._subnet_id(region, vpc, subnet)[7:]}{instance:06x}'
+
+    def describe_vpcs(self, region: str, params: dict) -> dict:
+        vpcs = self._region_vpcs(region, params)
+        items, token = self._page(params, len(vpcs), lambda i: {
+            'VpcId': self._vpc_id(region, vpcs[i]),
+            'CidrBlock': f'10.{vpcs[i] % 256}.0.0/16',
+            'State': 'available',
+            'IsDefault': False,
+            'OwnerId': self.account.account_id
+        })
+        return {'Vpcs': items, **({'NextToken': token} if token else {})}
+
+    def describe_subnets(self, region: str, params: dict) -> dict:
+        subnets = [(v, s) for v in self._region_vpcs(region, params) for s in range(self.account.subnets)]
+        items, token = self._page(params, len(subnets), lambda i: {
+            'SubnetId': self._subnet_id(region, *subnets[i]),
+            'VpcId': self._vpc_id(region, subnets[i][0]),
+            'AvailabilityZone': f'{region}{"abc"[subnets[i][1] % 3]}',
+            'CidrBlock': f'10.{subnets[i][0] % 256}.{subnets[i][1] % 256}.0/24',
+            'State': 'available'
+        })
+        return {'Subnets': items, **({'NextToken': token} if token else {})}
+
+    def describe_instances(self, region: str, params: dict) -> dict:
+        instances = [
+            (v, s, k) for v in self._region_vpcs(region, params)
+            for s in range(self.account.subnets) for k in range(self.account.instances)]
+        if instance_ids := params.get('InstanceIds'):
+            instances = [i for i in instances if self._instance_id(region, *i) in instance_ids]
+
+        def _make_reservation(i: int) -> dict:
+            vpc, subnet, instance = instances[i]
+            return {
+                'ReservationId': f'r-{self._instance_id(region, vpc, subnet, instance)[2:]}',
+                'OwnerId': self.account.account_id,
+                'Instances': [{
+                    'InstanceId': self._instance_id(region, vpc, subnet, instance),
+                    'InstanceType': self.account.instance_types[i % len(self.account.instance_types)],
+                    'State': {'Code': 16, 'Name': 'running'},
+                    'SubnetId': self._subnet_id(region, vpc, subnet),
+                    'VpcId': self._vpc_id(region, vpc),
+                    'LaunchTime': self.created_at + timedelta(minutes=i)
+                }]
+            }
+
+        items, token = self._page(params, len(instances), _make_reservation)
+        return {'Reservations': items, **({'NextToken': token} if token else {})}
+
+    # Pricing
+
+    def get_products(self, region: str, params: dict) -> dict:
+        filters = {f['Field']: f['Value'] for f in params.get('Filters', [])}
+        if 'instanceType' in filters:
+            price = self.prices.get(filters['instanceType'], 0.1)
+        else:
+            price = self.storage_price
+        product = {'terms': {'OnDemand': {'SKU.TERM': {'priceDimensions': {'SKU.TERM.DIM': {
+            'unit': 'Hrs', 'beginRange': '0', 'pricePerUnit': {'USD': str(price)}}}}}}}
+        return {'FormatVersion': 'aws_v1', 'PriceList': [json.dumps(product)]}
+
+    # S3
+
+    def _bucket_name(self, bucket: int) -> str:
+        return f'benchmark-{self.account.account_id}-{bucket:06d}'
+
+    def _bucket_index(self, bucket_name: str) -> int:
+        return int(bucket_name.rsplit('-', 1)[-1])
+
+    def _bucket_region(self, bucket: int) -> str:
+        return self.account.active_regions[bucket % len(self.account.active_regions)]
+
+    @staticmethod
+    def _object_size(bucket: int, i: int) -> int:
+        return 1024 + (i * 7919 + bucket * 104729) % (1 << 20)
+
+    def _bucket_size(self, bucket: int) -> int:
+        if (size := self._bucket_sizes.get(bucket)) is None:
+            size = self._bucket_sizes[bucket] = sum(self._object_size(bucket, i) for i in range(self.account.objects))
+        return size
+
+    def list_buckets(self, region: str, params: dict) -> dict:
+        return {
+            'Buckets': [
+                {'Name': self._bucket_name(b), 'CreationDate': self.created_at + timedelta(days=b)}
+                for b in range(self.account.buckets)],
+            'Owner': {'ID': self.account.account_id}}
+
+    def get_bucket_location(self, region: str, params: dict) -> dict:
+        bucket_region = self._bucket_region(self._bucket_index(params['Bucket']))
+        return {'LocationConstraint': None if bucket_region == 'us-east-1' else bucket_region}
+
+    def list_objects_v2(self, region: str, params: dict) -> dict:
+        bucket = self._bucket_index(params['Bucket'])
+        items, token = self._page(params, self.account.objects, lambda i: {
+            'Key': f'data/{i // 1000:05d}/object-{i:08d}.bin',
+            'Size': self._object_size(bucket, i),
+            'LastModified': self.created_at + timedelta(seconds=i),
+            'StorageClass': 'STANDARD'
+        }, token_param='ContinuationToken', limit_param='MaxKeys')
+        return {
+            'Name': params['Bucket'],
+            'Contents': items,
+            'KeyCount': len(items),
+            'IsTruncated': token is not None,
+            **({'NextContinuationToken': token} if token else {})}
+
+    # CloudWatch
+
+    def get_metric_data(self, region: str, params: dict) -> dict:
+        timestamp = datetime.now(tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        results = []
+        for query in params['MetricDataQueries']:
+            metric = query['MetricStat']['Metric']
+            dimensions = {d['Name']: d['Value'] for d in metric['Dimensions']}
+            bucket = self._bucket_index(dimensions['BucketName'])
+
+            values = []
+            if metric['MetricName'] == 'NumberOfObjects':
+                values = [float(self.account.objects)]
+            elif dimensions['StorageType'] == 'StandardStorage':
+                values = [float(self._bucket_size(bucket))]
+            results.append({
+                'Id': query['Id'],
+                'Label': metric['MetricName'],
+                'Timestamps': [timestamp] if values else [],
+                'Values': values,
+                'StatusCode': 'Complete'})
+        return {'MetricDataResults': results}
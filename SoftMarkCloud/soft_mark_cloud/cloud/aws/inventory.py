@@ -0,0 +1,243 @@
+import json
+import hashlib
+import itertools
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+
+from soft_mark_cloud.models import AWSInventoryResource, User
+
+
+class AWSInventoryDao:
+    """
+    Normalized inventory with one row per resource.
+
+    Collected data is a tree of domain items: service item lists resources, resources list sub-resources in
+    their items fields. Every resource is stored as a row referencing its parent by arn, string fields are kept
+    in `attributes_json`, items fields are kept there as placeholders and are filled with children rows when
+    the tree is rebuilt. Rows are upserted per (region, service), so only collected slice is rewritten.
+    """
+    batch_size = 1000
+    global_region = 'global'  # region name of global services in queries
+
+    state_field = 'State'
+    cost_field = 'Price per month'
+
+    # Fields describing resource, position only orders resources and isn't a change of resource
+    content_fields = [
+        'resource_type', 'service_name', 'region', 'parent_arn', 'parent_field', 'position', 'state', 'cost',
+        'attributes_json'
+    ]
+    hashed_fields = [field for field in content_fields if field != 'position']
+    update_fields = [*content_fields, 'content_hash', 'collected_at']
+
+    @staticmethod
+    def parse_cost(value: Optional[str]) -> Optional[float]:
+        try:
+            return float(value.rstrip(' $'))
+        except (AttributeError, ValueError):
+            return None
+
+    @classmethod
+    def get_content(cls, row: AWSInventoryResource) -> dict:
+        return {field: getattr(row, field) for field in cls.content_fields}
+
+    @classmethod
+    def get_content_hash(cls, row: AWSInventoryResource) -> str:
+        content = [getattr(row, field) for field in cls.hashed_fields]
+        return hashlib.sha256(json.dumps(content, separators=(',', ':')).encode()).hexdigest()
+
+    @classmethod
+    def from_content(cls, arn: str, content: dict) -> AWSInventoryResource:
+        """
+        Makes unsaved resource row of stored content, e.g. of inventory snapshot
+        """
+        return AWSInventoryResource(arn=arn, **content)
+
+    @classmethod
+    def _iter_item_rows(
+            cls, user: User, region: Optional[str], service_name: str, item: dict, parent_arn: Optional[str],
+            parent_field: str, position: int, collected_at: datetime
+    ) -> Iterator[AWSInventoryResource]:
+        # Sub-resources which have no arn of their own (e.g. bucket objects) are addressed within parent
+        name = item['name']
+        arn = name if parent_arn is None or name.startswith('arn:') else f'{parent_arn}/{name}'
+
+        attributes, children = [], []
+        for field in item['fields']:
+            if field['type'] == 'items':
+                attributes.append({'name': field['name'], 'type': 'items'})
+                children.append(field)
+            else:
+                attributes.append(field)
+        values = {field['name']: field['value'] for field in attributes if 'value' in field}
+
+        row = AWSInventoryResource(
+            user=user,
+            arn=arn,
+            resource_type=item['item_type'],
+            service_name=service_name,
+            region=region,
+            parent_arn=parent_arn,
+            parent_field=parent_field,
+            position=position,
+            state=values.get(cls.state_field),
+            cost=cls.parse_cost(values.get(cls.cost_field)),
+            attributes_json=json.dumps(attributes, separators=(',', ':')),
+            collected_at=collected_at)
+        row.content_hash = cls.get_content_hash(row)
+        yield row
+
+        for field in children:
+            for i, child in enumerate(field['value']):
+                yield from cls._iter_item_rows(
+                    user, region, service_name, child, arn, field['name'], i, collected_at)
+
+    @classmethod
+    def iter_rows(
+            cls, user: User, region: Optional[str], service_item: dict, collected_at: datetime
+    ) -> Iterator[AWSInventoryResource]:
+        """
+        Flattens service item into resource rows
+        """
+        for field in service_item['fields']:
+            for i, item in enumerate(field['value']):
+                yield from cls._iter_item_rows(
+                    user, region, service_item['name'], item, None, field['name'], i, collected_at)
+
+    @classmethod
+    def save_service(cls, user: User, region: Optional[str], service_item: dict):
+        """
+        Upserts resources of single (region, service), resources which are gone are deleted
+        """
+        collected_at = datetime.now(tz=timezone.utc)
+        rows = cls.iter_rows(user, region, service_item, collected_at)
+
+        with transaction.atomic():
+            while batch := list(itertools.islice(rows, cls.batch_size)):
+                AWSInventoryResource.objects.bulk_create(
+                    batch, update_conflicts=True, unique_fields=['user', 'arn'], update_fields=cls.update_fields)
+
+            AWSInventoryResource.objects.filter(
+                user=user, region=region, service_name=service_item['name']
+            ).exclude(collected_at=collected_at).delete()
+
+    @staticmethod
+    def iter_services(data: dict) -> Iterator[Tuple[Optional[str], dict]]:
+        """
+        Iterates over (region, service item) of collected data. Region is None for global services
+        """
+        for region, service_items in data.get('regional', {}).items():
+            for service_item in service_items:
+                yield region, service_item
+        for service_item in data.get('global', []):
+            yield None, service_item
+
+    @classmethod
+    def retain_services(cls, user: User, services: Iterable[Tuple[Optional[str], str]]):
+        """
+        Deletes resources of all (region, service) except specified ones
+        """
+        services = set(services)
+        stored = AWSInventoryResource.objects.filter(user=user).values_list('region', 'service_name').distinct()
+        for region, service_name in set(stored) - services:
+            AWSInventoryResource.objects.filter(user=user, region=region, service_name=service_name).delete()
+
+    @classmethod
+    def save_data(cls, user: User, data: dict):
+        """
+        Saves whole collected data
+        """
+        services = []
+        for region, service_item in cls.iter_services(data):
+            cls.save_service(user, region, service_item)
+            services.append((region, service_item['name']))
+        cls.retain_services(user, services)
+
+    @classmethod
+    def filter(cls, user: User, region: str = None, service_name: str = None):
+        rows = AWSInventoryResource.objects.filter(user=user)
+        if region is not None:
+            rows = rows.filter(region=None if region == cls.global_region else region)
+        if service_name is not None:
+            rows = rows.filter(service_name=service_name)
+        return rows
+
+    @classmethod
+    def get_regions(cls, user: User) -> List[str]:
+        regions = AWSInventoryResource.objects.filter(user=user).values_list('region', flat=True).distinct()
+        return sorted(r or cls.global_region for r in regions)
+
+    @classmethod
+    def get_data(cls, user: User, region: str = None, service_name: str = None) -> dict:
+        """
+        Rebuilds collected data tree of specified slice. Empty dict if nothing is stored
+        """
+        return cls.get_data_sized(user, region, service_name)[0]
+
+    @classmethod
+    def get_data_sized(cls, user: User, region: str = None, service_name: str = None) -> Tuple[dict, int]:
+        """
+        Rebuilds collected data tree of specified slice along with its stored size
+        """
+        rows = cls.filter(user, region, service_name).order_by('region', 'service_name', 'position', 'id')
+        return cls.build_data(rows.iterator(chunk_size=cls.batch_size))
+
+    @classmethod
+    def build_data(cls, rows: Iterable[AWSInventoryResource]) -> Tuple[dict, int]:
+        """
+        Builds collected data tree of resource rows ordered by position, along with size of rows
+        """
+        size = 0
+        items: Dict[str, dict] = {}
+        items_fields: Dict[Tuple[str, str], list] = {}
+        services: Dict[Tuple[Optional[str], str], dict] = {}
+        roots: Dict[Tuple[Optional[str], str, str], list] = {}
+        children: List[Tuple[AWSInventoryResource, dict]] = []
+
+        for row in rows:
+            size += len(row.arn) + len(row.attributes_json)
+            is_child = row.parent_arn is not None and row.arn.startswith(f'{row.parent_arn}/')
+            item = {
+                'name': row.arn[len(row.parent_arn) + 1:] if is_child else row.arn,
+                'item_type': row.resource_type,
+                'fields': row.attributes
+            }
+            for field in item['fields']:
+                if field['type'] == 'items':
+                    field['value'] = items_fields[(row.arn, field['name'])] = []
+            items[row.arn] = item
+
+            if row.parent_arn is not None:
+                children.append((row, item))
+                continue
+
+            service_key = (row.region, row.service_name)
+            if service_key not in services:
+                services[service_key] = {'name': row.service_name, 'item_type': row.service_name, 'fields': []}
+            if (root_key := (*service_key, row.parent_field)) not in roots:
+                roots[root_key] = []
+                services[service_key]['fields'].append(
+                    {'name': row.parent_field, 'type': 'items', 'value': roots[root_key]})
+            roots[root_key].append(item)
+
+        # Rows are ordered by position, so children are appended in their original order
+        for row, item in children:
+            if (siblings := items_fields.get((row.parent_arn, row.parent_field))) is not None:
+                siblings.append(item)
+
+        if not services:
+            return {}, 0
+
+        data = {'regional': {}, 'global': []}
+        for (service_region, _), service_item in sorted(services.items(), key=lambda s: (s[0][0] or '', s[0][1])):
+            if service_region is None:
+                data['global'].append(service_item)
+            else:
+                data['regional'].setdefault(service_region, []).append(service_item)
+        return data, size
+
+    @classmethod
+    def clear(cls, user: User):
+        AWSInventoryResource.objects.filter(user=user).delete()
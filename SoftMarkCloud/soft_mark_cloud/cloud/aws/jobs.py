@@ -0,0 +1,284 @@
+import os
+import socket
+from logging import getLogger
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+
+from soft_mark_cloud.codec import Payload
+from soft_mark_cloud.models import AWSJob, AWSProcessStatus, User
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+
+
+logger = getLogger(__name__)
+
+
+class AWSJobQueue:
+    """
+    Durable queue of background process runs executed by `run_workers` command.
+
+    Single job per user process is queued or running at a time, so enqueue is idempotent: repeated request gets
+    already active job. Status of process is created along with job, so pages show it in progress right away.
+    Failed jobs are retried with exponential backoff up to `max_attempts`.
+
+    Workers are shared between users with self-clocked weighted fair queuing. Job costs its estimated run time,
+    which is duration of previous run of the same process of user, and gets virtual finish tag: the later of
+    current virtual time and finish tag of user's active jobs, plus cost divided by weight of job priority class.
+    Jobs are claimed in order of finish tags, virtual time is the latest tag taken by workers. So users share
+    workers in proportion to weights rather than to size of their accounts, and interactive refreshes overtake
+    scheduled ones without starving them. No user runs more than `user_quota` jobs at a time, except quota exempt
+    ones, e.g. long deploys don't hold refreshes of their user. Job is claimed by single update conditioned on
+    number of running jobs of its user, so concurrent workers don't exceed quota. Databases which check it against
+    transaction snapshot (e.g. PostgreSQL) also serialize claims of user's jobs by lock of user row, SQLite runs
+    one write at a time anyway.
+
+    Examples
+    --------
+    >>> AWSJobQueue.enqueue(user, AWSCollector.process_name, lambda: collector.start_status(user), max_attempts=3)
+    """
+    State = AWSJob.State
+    Priority = AWSJob.Priority
+
+    retry_backoff = 30  # seconds, doubled with every attempt
+    claim_candidates = 10
+
+    user_quota = 1  # running jobs per user
+    priority_weights = {
+        Priority.INTERACTIVE: 4,
+        Priority.SCHEDULED: 1,
+    }
+    default_cost = 60  # seconds, cost of process which has never run
+    remote_stall_timeout = 10 * 60  # seconds without heartbeat after which job of worker on another host is released
+
+    @staticmethod
+    def get_dedupe_key(user: User, process_name: str) -> str:
+        return f'{user.pk}:{process_name}'
+
+    @classmethod
+    def get_active_job(cls, user: User, process_name: str) -> Optional[AWSJob]:
+        return AWSJob.objects.filter(
+            dedupe_key=cls.get_dedupe_key(user, process_name), state__in=[cls.State.QUEUED, cls.State.RUNNING]
+        ).first()
+
+    @classmethod
+    def estimate_cost(cls, user: User, process_name: str, default: float = None) -> float:
+        """
+        Gets duration in seconds of the latest completed run of user process, `default` if it has never run
+        """
+        job = AWSJob.objects.filter(
+            user=user, process_name=process_name, state=cls.State.DONE, started_at__isnull=False
+        ).order_by('-finished_at').first()
+        if job is None:
+            return default or cls.default_cost
+        return max((job.finished_at - job.started_at).total_seconds(), 1)
+
+    @classmethod
+    def get_virtual_time(cls) -> float:
+        """
+        Gets finish tag of the latest claimed job
+        """
+        latest = AWSJob.objects.filter(started_at__isnull=False).order_by('-started_at', '-id')
+        return latest.values_list('virtual_finish', flat=True).first() or 0
+
+    @classmethod
+    def get_virtual_finish(cls, user: User, cost: float, priority: str) -> float:
+        user_finish = AWSJob.objects.filter(
+            user=user, state__in=[cls.State.QUEUED, cls.State.RUNNING]
+        ).aggregate(tag=Max('virtual_finish'))['tag']
+        start = max(cls.get_virtual_time(), user_finish or 0)
+        return start + cost / cls.priority_weights[priority]
+
+    @classmethod
+    def promote(cls, job: AWSJob, priority: str):
+        """
+        Moves queued job to higher priority class, e.g. scheduled refresh requested from page
+        """
+        job.priority = priority
+        job.virtual_finish = min(
+            job.virtual_finish, cls.get_virtual_time() + job.cost / cls.priority_weights[priority])
+        AWSJob.objects.filter(pk=job.pk, state=cls.State.QUEUED).update(
+            priority=job.priority, virtual_finish=job.virtual_finish)
+
+    @classmethod
+    def enqueue(
+            cls, user: User, process_name: str, start_status: Callable[[], AWSProcessStatus], payload: Any = None,
+            profile: bool = None, max_attempts: int = 1, priority: str = Priority.INTERACTIVE,
+            default_cost: float = None, quota_exempt: bool = False
+    ) -> Optional[AWSJob]:
+        """
+        Queues process run unless it's already queued or running. `start_status` creates process status of job,
+        `default_cost` is estimated run seconds of process which has never run
+        """
+        if job := cls.get_active_job(user, process_name):
+            if job.state == cls.State.QUEUED and cls.priority_weights[priority] > cls.priority_weights[job.priority]:
+                cls.promote(job, priority)
+            return job
+
+        cost = cls.estimate_cost(user, process_name, default_cost)
+        try:
+            with transaction.atomic():
+                job = AWSJob.objects.create(
+                    user=user,
+                    process_name=process_name,
+                    dedupe_key=cls.get_dedupe_key(user, process_name),
+                    priority=priority,
+                    cost=cost,
+                    virtual_finish=cls.get_virtual_finish(user, cost, priority),
+                    quota_exempt=quota_exempt,
+                    payload_json=Payload.dumps(payload) if payload is not None else None,
+                    profile=profile,
+                    max_attempts=max_attempts)
+                job.status = start_status()
+                job.save(update_fields=['status'])
+        except IntegrityError:
+            return cls.get_active_job(user, process_name)  # enqueued by concurrent request
+
+        logger.info(f"Job {job.pk} {process_name} of {user} queued as {priority}, estimated {cost:.0f}s")
+        return job
+
+    @classmethod
+    def get_busy_users(cls):
+        """
+        Gets ids of users running as many jobs as their quota allows
+        """
+        return AWSJob.objects.filter(state=cls.State.RUNNING, quota_exempt=False).values('user_id').annotate(
+            running=Count('id')).filter(running__gte=cls.user_quota).values('user_id')
+
+    @classmethod
+    def get_candidates(cls, now: datetime):
+        """
+        Gets queued jobs of users under quota in order they are taken by workers
+        """
+        return AWSJob.objects.filter(
+            state=cls.State.QUEUED, available_at__lte=now, status__isnull=False
+        ).exclude(user_id__in=cls.get_busy_users(), quota_exempt=False).order_by('virtual_finish', 'id')
+
+    @classmethod
+    def get_running_count(cls):
+        """
+        Gets expression of number of running quota bound jobs of job's user
+        """
+        running = AWSJob.objects.filter(
+            user_id=OuterRef('user_id'), state=cls.State.RUNNING, quota_exempt=False
+        ).order_by().values('user_id').annotate(count=Count('id')).values('count')
+        return Coalesce(Subquery(running), 0)
+
+    @classmethod
+    def _claim_job(cls, job: AWSJob, worker: str, now: datetime) -> bool:
+        with transaction.atomic():
+            if not job.quota_exempt:
+                # Claimer of user's job waits for lock of user row until previous claim is committed. No-op on SQLite
+                User.objects.select_for_update().filter(pk=job.user_id).first()
+
+            # Quota is checked by the same statement which claims job, so no claim runs in between
+            return bool(AWSJob.objects.filter(pk=job.pk, state=cls.State.QUEUED).filter(
+                Q(quota_exempt=True) | LessThan(cls.get_running_count(), cls.user_quota)
+            ).update(state=cls.State.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1))
+
+    @classmethod
+    def claim(cls, worker: str) -> Optional[AWSJob]:
+        """
+        Takes next queued job for worker. Job is taken with conditional update, so concurrent workers never
+        take the same job
+        """
+        now = datetime.now(tz=timezone.utc)
+        for job in cls.get_candidates(now)[:cls.claim_candidates]:
+            if cls._claim_job(job, worker, now):
+                job.refresh_from_db()
+                return job
+        return None
+
+    @classmethod
+    def finish(cls, job: AWSJob, error: str = None) -> bool:
+        """
+        Completes job. Failed job is queued again while it has attempts left, otherwise its status is failed.
+        Only the attempt which has claimed job finishes it, so late finish of released attempt changes nothing.
+        Gets whether job is finished
+        """
+        now = datetime.now(tz=timezone.utc)
+        if error is None:
+            state, available_at = cls.State.DONE, job.available_at
+        elif job.attempts < job.max_attempts:
+            state, available_at = cls.State.QUEUED, now + timedelta(seconds=cls.retry_backoff * 2 ** (job.attempts - 1))
+            logger.info(f"Job {job.pk} {job.process_name} will be retried, attempt {job.attempts} failed: {error}")
+        else:
+            state, available_at = cls.State.FAILED, job.available_at
+            logger.warning(f"Job {job.pk} {job.process_name} failed: {error}")
+
+        finished = AWSJob.objects.filter(pk=job.pk, state=cls.State.RUNNING, attempts=job.attempts).update(
+            state=state, error=error, available_at=available_at, worker=None,
+            finished_at=now if state != cls.State.QUEUED else None)
+        if not finished:
+            logger.warning(f"Job {job.pk} {job.process_name} attempt {job.attempts} was released before finishing")
+            return False
+
+        if state == cls.State.FAILED and job.status_id:
+            AWSStatusDao.fail_statuses(AWSProcessStatus.objects.filter(pk=job.status_id))
+        return True
+
+    @classmethod
+    def release_worker(cls, worker: str, reason: str) -> int:
+        """
+        Finishes jobs of worker process which has died with error. Gets number of released jobs
+        """
+        jobs = list(AWSJob.objects.filter(state=cls.State.RUNNING, worker=worker))
+        for job in jobs:
+            cls.finish(job, error=reason)
+        return len(jobs)
+
+    @staticmethod
+    def is_worker_alive(worker: str) -> Optional[bool]:
+        """
+        Checks whether worker process is running. None if worker runs on another host
+        """
+        host, _, pid = worker.rpartition(':')
+        if host != socket.gethostname():
+            return None
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # process of another user
+        return True
+
+    @classmethod
+    def get_stalled_jobs(cls, timeout: int = None):
+        """
+        Gets running jobs whose status has missed heartbeats or has been failed as expired, e.g. process is hung
+        """
+        expired = AWSStatusDao.get_expired_statuses(timeout)
+        return AWSJob.objects.filter(state=cls.State.RUNNING).filter(
+            Q(status__in=expired) | Q(status__failed=True)).select_related('status')
+
+    @classmethod
+    def recover_stalled(cls, timeout: int = None) -> int:
+        """
+        Finishes stalled jobs whose worker is gone. Job of worker on another host is finished once it has missed
+        heartbeats for `remote_stall_timeout`, since its worker can't be checked. Gets number of finished jobs
+        """
+        remote_dead_since = datetime.now(tz=timezone.utc) - timedelta(seconds=cls.remote_stall_timeout)
+        recovered = 0
+        for job in cls.get_stalled_jobs(timeout):
+            alive = cls.is_worker_alive(job.worker or '')
+            last_seen = job.status.heartbeat_at or job.status.created_at
+            if alive or (alive is None and last_seen >= remote_dead_since):
+                continue  # hung worker is killed by its pool
+            recovered += cls.finish(job, error='Worker stopped sending heartbeats')
+        return recovered
+
+    @classmethod
+    def heartbeat_queued(cls):
+        """
+        Keeps statuses of queued jobs alive, waiting in queue is not a dead process
+        """
+        statuses = AWSProcessStatus.objects.filter(jobs__state=cls.State.QUEUED)
+        user_ids = set(statuses.values_list('user_id', flat=True))
+        AWSProcessStatus.objects.filter(pk__in=statuses.values('pk')).update(
+            heartbeat_at=datetime.now(tz=timezone.utc))
+        for user_id in user_ids:
+            AWSStatusDao.invalidate(user_id)
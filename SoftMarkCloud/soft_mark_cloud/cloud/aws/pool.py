@@ -0,0 +1,157 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import boto3
+from botocore.client import BaseClient
+from botocore.config import Config
+
+
+class AWSClientPool:
+    """
+    Process-wide pool of boto3 sessions and clients.
+
+    Sessions are kept per credentials, clients are kept per (credentials fingerprint, service, region), so every
+    `AWSClient` built for the same key reuses the same boto3 client and its HTTP connection pool.
+    Account ids are memoized per credentials for `account_id_ttl` seconds. Only `max_credentials` most recently
+    used credentials are kept, sessions, clients and account ids of the least recently used ones are dropped.
+    Clients still referenced by running collections keep working, they are just not reused.
+
+    Examples
+    --------
+    >>> from soft_mark_cloud.cloud.aws.pool import AWSClientPool
+    >>> ec2 = AWSClientPool.get_client(creds, 'ec2', 'eu-central-1')
+    >>> ec2 is AWSClientPool.get_client(creds, 'ec2', 'eu-central-1')
+    True
+    """
+    account_id_ttl = 60 * 60  # 1 hour
+    max_pool_connections = 50
+    retries = {'mode': 'adaptive', 'max_attempts': 8}  # adaptive mode rate limits client side on throttling
+    max_credentials = 64
+
+    # Called with (client, credentials fingerprint, service name, region name) for every new client
+    client_hooks: List[Callable[[BaseClient, str, str, Optional[str]], None]] = []
+    # Called with credentials fingerprint whenever credentials are dropped from pool
+    eviction_hooks: List[Callable[[str], None]] = []
+
+    _lock = threading.RLock()
+    _sessions: Dict[str, boto3.Session] = {}
+    _clients: Dict[Tuple[str, str, Optional[str]], BaseClient] = {}
+    _account_ids: Dict[str, Tuple[str, float]] = {}
+    _recent: 'OrderedDict[str, None]' = OrderedDict()  # fingerprints from least to most recently used
+
+    @staticmethod
+    def fingerprint(aws_access_key_id: str, aws_secret_access_key: str) -> str:
+        """
+        Gets credentials fingerprint. Secrets are never used as keys directly
+        """
+        return hashlib.sha256(f'{aws_access_key_id}:{aws_secret_access_key}'.encode()).hexdigest()
+
+    @classmethod
+    def _touch(cls, fingerprint: str):
+        # Called under the lock
+        cls._recent[fingerprint] = None
+        cls._recent.move_to_end(fingerprint)
+        while len(cls._recent) > cls.max_credentials:
+            evicted, _ = cls._recent.popitem(last=False)
+            cls._sessions.pop(evicted, None)
+            cls._account_ids.pop(evicted, None)
+            for key in [key for key in cls._clients if key[0] == evicted]:
+                del cls._clients[key]
+            for hook in cls.eviction_hooks:
+                hook(evicted)
+
+    @classmethod
+    def get_session(cls, credentials) -> boto3.Session:
+        """
+        Gets boto3 session for specified credentials
+        """
+        fingerprint = credentials.fingerprint
+        with cls._lock:
+            cls._touch(fingerprint)
+            if (session := cls._sessions.get(fingerprint)) is None:
+                session = boto3.Session(
+                    aws_access_key_id=credentials.aws_access_key_id,
+                    aws_secret_access_key=credentials.aws_secret_access_key)
+                cls._sessions[fingerprint] = session
+            return session
+
+    @classmethod
+    def get_client(cls, credentials, service_name: str, region_name: str = None) -> BaseClient:
+        """
+        Gets boto3 client for specified credentials, service and region
+        """
+        key = (credentials.fingerprint, service_name, region_name)
+
+        # boto3 sessions are not thread safe, so clients are created under the lock
+        with cls._lock:
+            cls._touch(credentials.fingerprint)
+            if (client := cls._clients.get(key)) is None:
+                client = cls.get_session(credentials).client(
+                    service_name,
+                    region_name=region_name,
+                    config=Config(max_pool_connections=cls.max_pool_connections, retries=cls.retries))
+                for hook in cls.client_hooks:
+                    hook(client, *key)
+                cls._clients[key] = client
+            return client
+
+    @classmethod
+    def register_client_hook(cls, hook: Callable[[BaseClient, str, str, Optional[str]], None]):
+        """
+        Registers hook called for every newly created client, e.g. to register botocore event handlers
+        """
+        if hook not in cls.client_hooks:
+            cls.client_hooks.append(hook)
+
+    @classmethod
+    def unregister_client_hook(cls, hook: Callable[[BaseClient, str, str, Optional[str]], None]):
+        """
+        Unregisters client hook. Already created clients keep their event handlers
+        """
+        if hook in cls.client_hooks:
+            cls.client_hooks.remove(hook)
+
+    @classmethod
+    def register_eviction_hook(cls, hook: Callable[[str], None]):
+        """
+        Registers hook called with fingerprint of dropped credentials, e.g. to drop per credentials state
+        """
+        if hook not in cls.eviction_hooks:
+            cls.eviction_hooks.append(hook)
+
+    @classmethod
+    def set_account_id(cls, credentials, account_id: str):
+        with cls._lock:
+            cls._account_ids[credentials.fingerprint] = (account_id, time.monotonic() + cls.account_id_ttl)
+
+    @classmethod
+    def get_account_id(cls, credentials) -> str:
+        """
+        Gets memoized account id for specified credentials
+        """
+        cached = cls._account_ids.get(credentials.fingerprint)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        account_id = cls.get_client(credentials, 'sts').get_caller_identity()['Account']
+        cls.set_account_id(credentials, account_id)
+        return account_id
+
+    @classmethod
+    def clear(cls):
+        """
+        Drops all pooled sessions, clients and account ids
+        """
+        cls._lock = threading.RLock()
+        cls._sessions = {}
+        cls._clients = {}
+        cls._account_ids = {}
+        cls._recent = OrderedDict()
+
+
+# Forked processes must not share sockets of the parent connection pools
+os.register_at_fork(after_in_child=AWSClientPool.clear)
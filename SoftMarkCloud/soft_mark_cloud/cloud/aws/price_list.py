@@ -0,0 +1,290 @@
+import re
+import csv
+import sys
+import json
+import itertools
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+
+from soft_mark_cloud.models import AWSPriceListItem
+
+
+def normalize_attribute(name: str) -> str:
+    """
+    Normalizes attribute name, so CSV columns (`Pre Installed S/W`), JSON attributes (`preInstalledSw`)
+    and Pricing API filter fields match each other
+    """
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+class JSONStreamReader:
+    """
+    Minimal incremental reader of JSON document.
+    Allows to walk objects key by key decoding only needed values and skipping the rest without materializing them.
+
+    Examples
+    --------
+    >>> reader = JSONStreamReader(open('offer.json'))
+    >>> for key in reader.iter_object():
+    ...     if key == 'products':
+    ...         products = reader.read_value()
+    ...     else:
+    ...         reader.skip_value()
+    """
+    chunk_size = 1 << 20  # 1 MB
+    whitespace = ' \t\r\n'
+    # Truncated number, e.g. `1.` or `1e-`, decodes as its shorter prefix followed by up to this many chars
+    number_lookahead = 3
+
+    _structure_re = re.compile(r'["{}\[\]]')
+    _string_re = re.compile(r'["\\]')
+
+    def __init__(self, file: IO[str]):
+        self.file = file
+        self.buf = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _next_char(self) -> str:
+        """
+        Skips whitespaces and returns next char without consuming it
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.whitespace:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON document')
+
+    def _consume(self, expected: str):
+        if (char := self._next_char()) != expected:
+            raise ValueError(f'Expected {expected!r}, got {char!r} in JSON document')
+        self.pos += 1
+
+    def read_value(self) -> Any:
+        self._next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # Numbers and literals ending near the end of buffer may be truncated
+            if len(self.buf) - end < self.number_lookahead and not isinstance(value, (dict, list, str)) \
+                    and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        if self._next_char() not in '{[':
+            self.read_value()
+            return
+
+        depth, in_string = 0, False
+        while True:
+            pattern = self._string_re if in_string else self._structure_re
+            if (match := pattern.search(self.buf, self.pos)) is None:
+                self.pos = len(self.buf)
+                if not self._fill():
+                    raise ValueError('Unexpected end of JSON document')
+                continue
+
+            char, self.pos = match.group(), match.end()
+            if in_string:
+                if char == '\\':
+                    if self.pos >= len(self.buf) and not self._fill():
+                        raise ValueError('Unexpected end of JSON document')
+                    self.pos += 1  # escaped char
+                else:
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Iterates over object keys. Value of every yielded key must be read or skipped by consumer
+        """
+        self._consume('{')
+        if self._next_char() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self.read_value()
+            self._consume(':')
+            yield key
+
+            char = self._next_char()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f'Expected \',\' or \'}}\', got {char!r} in JSON document')
+
+
+class AWSPriceListIndex:
+    """
+    Local index of AWS bulk price list offer files. Keeps first tier OnDemand USD price of every SKU.
+
+    Examples
+    --------
+    >>> with open('AmazonEC2/current/eu-central-1/index.csv') as offer_file:
+    ...     AWSPriceListIndex.ingest('AmazonEC2', AWSPriceListIndex.iter_csv_offer(offer_file))
+    >>> AWSPriceListIndex.lookup('AmazonEC2', PricingClient.ec2_instance_filters('t2.micro'))
+    0.0134
+    """
+    batch_size = 5000
+
+    columns = {
+        'regioncode': 'region_code',
+        'productfamily': 'product_family',
+        'usagetype': 'usage_type',
+        'instancetype': 'instance_type',
+        'operatingsystem': 'operating_system',
+        'tenancy': 'tenancy',
+        'capacitystatus': 'capacity_status',
+        'preinstalledsw': 'pre_installed_sw',
+        'storageclass': 'storage_class',
+    }
+
+    # Used to choose between several matching SKUs when filters don't narrow them down
+    preferred = {
+        'region_code': 'us-east-1',
+        'tenancy': 'Shared',
+        'pre_installed_sw': 'NA',
+        'storage_class': 'General Purpose',
+    }
+
+    @classmethod
+    def get_columns(cls, attributes: Dict[str, str]) -> Dict[str, str]:
+        columns = {}
+        for name, value in attributes.items():
+            if value and (column := cls.columns.get(normalize_attribute(name))):
+                columns[column] = sys.intern(value)
+        return columns
+
+    @classmethod
+    def iter_csv_offer(cls, file: IO[str]) -> Iterator[dict]:
+        """
+        Streams records of CSV offer file row by row
+        """
+        reader = csv.reader(file)
+
+        # Offer files start with metadata lines followed by the header row
+        header = None
+        for row in reader:
+            if row and row[0] == 'SKU':
+                header = [normalize_attribute(c) for c in row]
+                break
+        if header is None:
+            raise ValueError('CSV offer file has no header row')
+
+        for row in reader:
+            record = dict(zip(header, row))
+            if record.get('termtype') != 'OnDemand' or record.get('currency', 'USD') != 'USD':
+                continue
+            if record.get('startingrange', '0') not in ('0', ''):
+                continue
+            yield {
+                'sku': record['sku'],
+                'unit': record['unit'],
+                'price': float(record['priceperunit']),
+                **cls.get_columns(
+                    {c: v for c, v in record.items() if c in cls.columns})
+            }
+
+    @staticmethod
+    def get_on_demand_price(offers: dict) -> Optional[Tuple[str, float]]:
+        for offer in offers.values():
+            for dimension in offer['priceDimensions'].values():
+                if dimension.get('beginRange', '0') == '0' and 'USD' in dimension['pricePerUnit']:
+                    return dimension['unit'], float(dimension['pricePerUnit']['USD'])
+        return None
+
+    @classmethod
+    def iter_json_offer(cls, file: IO[str]) -> Iterator[dict]:
+        """
+        Streams records of JSON offer file. Only product attributes are kept in memory,
+        terms are decoded SKU by SKU and unused term types are skipped without decoding
+        """
+        reader = JSONStreamReader(file)
+        products = {}
+
+        for key in reader.iter_object():
+            if key == 'products':
+                for sku in reader.iter_object():
+                    product = reader.read_value()
+                    products[sku] = cls.get_columns({
+                        'productFamily': product.get('productFamily'), **product.get('attributes', {})})
+
+            elif key == 'terms':
+                for term_type in reader.iter_object():
+                    if term_type != 'OnDemand':
+                        reader.skip_value()
+                        continue
+
+                    for sku in reader.iter_object():
+                        offers = reader.read_value()
+                        if sku not in products or not (price := cls.get_on_demand_price(offers)):
+                            continue
+                        unit, price_per_unit = price
+                        yield {'sku': sku, 'unit': unit, 'price': price_per_unit, **products[sku]}
+            else:
+                reader.skip_value()
+
+    @classmethod
+    def ingest(cls, service_code: str, records: Iterable[dict]) -> int:
+        """
+        Replaces index of specified service with records. Returns number of stored records
+        """
+        count = 0
+        records = iter(records)
+        with transaction.atomic():
+            AWSPriceListItem.objects.filter(service_code=service_code).delete()
+            while batch := list(itertools.islice(records, cls.batch_size)):
+                AWSPriceListItem.objects.bulk_create(
+                    [AWSPriceListItem(service_code=service_code, **record) for record in batch],
+                    ignore_conflicts=True)
+                count += len(batch)
+        return count
+
+    @classmethod
+    def lookup(cls, service_code: str, filters: List[dict]) -> Optional[float]:
+        """
+        Gets price per unit matching Pricing API filters. None if filters can't be answered by index
+        """
+        query = {}
+        for f in filters:
+            column = cls.columns.get(normalize_attribute(f['Field']))
+            if f['Type'] != 'TERM_MATCH' or column is None:
+                return None
+            query[column] = f['Value']
+
+        items = AWSPriceListItem.objects.filter(service_code=service_code, price__gt=0, **query).order_by('sku')
+        for column, value in cls.preferred.items():
+            if column not in query and (narrowed := items.filter(**{column: value})).exists():
+                items = narrowed
+
+        if item := items.first():
+            return item.price
+        return None
@@ -0,0 +1,110 @@
+import json
+import time
+import hashlib
+import threading
+from logging import getLogger
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import DatabaseError
+
+from soft_mark_cloud.models import AWSPrice
+
+
+logger = getLogger(__name__)
+
+
+class AWSPriceCache:
+    """
+    Prices cache shared across users, prices don't depend on account.
+
+    Prices are kept in database for `ttl` seconds, recently used ones are also kept in process LRU of `lru_size`.
+    Keys are built from (service code, normalized filters, region).
+    """
+    ttl = 24 * 60 * 60  # 1 day
+    lru_size = 1024
+
+    _lock = threading.Lock()
+    _lru: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    @staticmethod
+    def make_key(service_code: str, filters: List[dict], region: str) -> str:
+        normalized = sorted((f['Type'], f['Field'], str(f['Value'])) for f in filters)
+        return hashlib.sha256(json.dumps([service_code, region, normalized]).encode()).hexdigest()
+
+    @classmethod
+    def _lru_get(cls, key: str) -> Optional[float]:
+        with cls._lock:
+            if (cached := cls._lru.get(key)) is None:
+                return None
+            price, expires_at = cached
+            if expires_at < time.monotonic():
+                del cls._lru[key]
+                return None
+            cls._lru.move_to_end(key)
+            return price
+
+    @classmethod
+    def _lru_set(cls, key: str, price: float, ttl: float):
+        with cls._lock:
+            cls._lru[key] = (price, time.monotonic() + ttl)
+            cls._lru.move_to_end(key)
+            while len(cls._lru) > cls.lru_size:
+                cls._lru.popitem(last=False)
+
+    @classmethod
+    def get_many(cls, keys: Iterable[str]) -> Dict[str, float]:
+        """
+        Gets cached prices for specified keys. Missed keys are omitted
+        """
+        prices, missed = {}, []
+        for key in keys:
+            if (price := cls._lru_get(key)) is not None:
+                prices[key] = price
+            else:
+                missed.append(key)
+
+        if not missed:
+            return prices
+
+        expired_at = datetime.now(tz=timezone.utc) - timedelta(seconds=cls.ttl)
+        try:
+            rows = AWSPrice.objects.filter(key__in=missed, updated_at__gt=expired_at)
+            for row in rows:
+                remaining = (row.updated_at - expired_at).total_seconds()
+                cls._lru_set(row.key, row.price, remaining)
+                prices[row.key] = row.price
+        except DatabaseError as e:
+            logger.warning(f"Prices cache is unavailable: {e}")
+
+        return prices
+
+    @classmethod
+    def get(cls, service_code: str, filters: List[dict], region: str) -> Optional[float]:
+        key = cls.make_key(service_code, filters, region)
+        return cls.get_many([key]).get(key)
+
+    @classmethod
+    def set(cls, service_code: str, filters: List[dict], region: str, price: float):
+        key = cls.make_key(service_code, filters, region)
+        cls._lru_set(key, price, cls.ttl)
+        try:
+            AWSPrice.objects.update_or_create(
+                key=key,
+                defaults={
+                    'service_code': service_code,
+                    'region': region,
+                    'filters_json': json.dumps(filters),
+                    'price': price
+                })
+        except DatabaseError as e:
+            logger.warning(f"Prices cache is unavailable: {e}")
+
+    @classmethod
+    def clear(cls):
+        """
+        Clears process LRU
+        """
+        with cls._lock:
+            cls._lru.clear()
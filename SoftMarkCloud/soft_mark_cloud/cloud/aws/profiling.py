@@ -0,0 +1,128 @@
+import io
+import sys
+import time
+import pstats
+import marshal
+import cProfile
+import threading
+from logging import getLogger
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from soft_mark_cloud.models import AWSProcessProfile, User
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+
+
+logger = getLogger(__name__)
+
+
+class AWSProcessProfiler:
+    """
+    cProfile capture of background process run.
+
+    cProfile only profiles the thread it's enabled in, so every thread started during capture gets its own
+    profiler and stats of all threads are merged on finish. Stats dump and summary of top functions by cumulative
+    time are stored per user process along with status of profiled run. Profiles outlive statuses, which are
+    replaced by every next run, only `keep_profiles` latest profiles of user process are kept.
+
+    Examples
+    --------
+    >>> with AWSProcessProfiler.profile(user, AWSCollector.process_name, enabled=True):
+    ...     AWSCollector(creds).collect_all()
+    >>> AWSProcessProfiler.get_profiles(user, AWSCollector.process_name).first().summary
+    """
+    top_functions = 40
+    keep_profiles = 10
+
+    def __init__(self):
+        self.profilers: List[cProfile.Profile] = []
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled(enabled: Optional[bool] = None) -> bool:
+        """
+        Checks whether run must be profiled. Defaults to `PROFILE_BACKGROUND_PROCESSES` setting
+        """
+        if enabled is not None:
+            return enabled
+        return getattr(settings, 'PROFILE_BACKGROUND_PROCESSES', False)
+
+    def _profile_thread(self, *args):
+        # Called as profile function of newly started thread, replaces itself with thread profiler
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    @contextmanager
+    def capture(self) -> Iterator['AWSProcessProfiler']:
+        profiler = cProfile.Profile()
+        self.profilers = [profiler]
+
+        started_at = time.perf_counter()
+        threading.setprofile(self._profile_thread)
+        profiler.enable()
+        try:
+            yield self
+        finally:
+            profiler.disable()
+            threading.setprofile(None)
+            self.duration = time.perf_counter() - started_at
+
+    def get_stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+    def get_summary(self, stats: pstats.Stats) -> str:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_functions)
+        return stream.getvalue()
+
+    @classmethod
+    def get_profiles(cls, user: User, process_name: str):
+        """
+        Gets profiles of user process from the latest one
+        """
+        return AWSProcessProfile.objects.filter(user=user, process_name=process_name).order_by('-created_at', '-id')
+
+    def save(self, user: User, process_name: str) -> Optional[AWSProcessProfile]:
+        stats = self.get_stats()
+        try:
+            profile = AWSProcessProfile.objects.create(
+                user=user,
+                process_name=process_name,
+                status=AWSStatusDao.get_status(user, process_name),
+                stats=marshal.dumps(stats.stats),
+                summary=self.get_summary(stats),
+                duration=self.duration)
+            outdated = self.get_profiles(user, process_name)[self.keep_profiles:].values_list('pk', flat=True)
+            AWSProcessProfile.objects.filter(pk__in=list(outdated)).delete()
+            return profile
+        except DatabaseError as e:
+            logger.warning(f"Can`t save {process_name} profile: {e}")
+            return None
+
+    @classmethod
+    @contextmanager
+    def profile(cls, user: User, process_name: str, enabled: Optional[bool] = None) -> Iterator[None]:
+        """
+        Profiles block if profiling is enabled. Profile is saved even if block fails
+        """
+        if not cls.is_enabled(enabled):
+            yield
+            return
+
+        profiler = cls()
+        try:
+            with profiler.capture():
+                yield
+        finally:
+            profiler.save(user, process_name)
@@ -0,0 +1,121 @@
+from logging import getLogger
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from soft_mark_cloud.models import AWSRegionActivity
+from soft_mark_cloud.cloud.aws.core import AWSCreds
+from soft_mark_cloud.cloud.aws.pool import AWSClientPool
+
+
+logger = getLogger(__name__)
+
+
+class AWSRegionIndexDao:
+    """
+    Persisted per account index of regions activity
+    """
+    @classmethod
+    def get_index(cls, account_id: str) -> Dict[str, AWSRegionActivity]:
+        return {a.region: a for a in AWSRegionActivity.objects.filter(account_id=account_id)}
+
+    @classmethod
+    def update(cls, account_id: str, region: str, active: bool, error_code: str = None) -> AWSRegionActivity:
+        activity, _ = AWSRegionActivity.objects.update_or_create(
+            account_id=account_id,
+            region=region,
+            defaults={'active': active, 'error_code': error_code})
+        return activity
+
+    @classmethod
+    def is_fresh(cls, activity: AWSRegionActivity, ttl: int) -> bool:
+        return activity.checked_at + timedelta(seconds=ttl) > datetime.now(tz=timezone.utc)
+
+
+class AWSRegionDiscovery:
+    """
+    Discovers enabled regions and sorts out the ones which have nothing to collect.
+
+    Regions are cheaply probed for instances and VPCs, default VPC is collected too, so only regions without any
+    VPC are empty. Probe results are kept in the region activity index for `ttl` seconds, so empty regions and
+    regions which are not accessible (not opted in, auth failure) are skipped without any API call until the entry
+    expires. Interactive refreshes trust results for `interactive_ttl` only, so resources created since show up.
+    """
+    ttl = 6 * 60 * 60  # 6 hours
+    interactive_ttl = 5 * 60  # 5 minutes
+    max_workers = 8
+    discovery_region = 'us-east-1'
+    skip_error_codes = ('AuthFailure', 'OptInRequired', 'UnauthorizedOperation', 'InvalidClientTokenId')
+
+    def __init__(self, credentials: AWSCreds, interactive: bool = False):
+        self.credentials = credentials
+        self.interactive = interactive
+
+    def discover_regions(self, fallback: List[str]) -> List[str]:
+        """
+        Gets regions enabled for account. Falls back to specified regions if discovery isn't allowed
+        """
+        client = AWSClientPool.get_client(self.credentials, 'ec2', self.discovery_region)
+        try:
+            resp = client.describe_regions(AllRegions=True)
+        except ClientError as e:
+            logger.warning(f"Regions discovery failed: {e}")
+            return list(fallback)
+
+        return sorted(
+            r['RegionName'] for r in resp['Regions']
+            if r.get('OptInStatus', 'opt-in-not-required') != 'not-opted-in')
+
+    def probe_region(self, region: str) -> Tuple[bool, Optional[str]]:
+        """
+        Checks whether region has any resources. Returns (active, error code)
+        """
+        client = AWSClientPool.get_client(self.credentials, 'ec2', region)
+        try:
+            if client.describe_instances(MaxResults=5).get('Reservations'):
+                return True, None
+            return bool(client.describe_vpcs(MaxResults=5).get('Vpcs')), None
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code')
+            if error_code in self.skip_error_codes:
+                return False, error_code
+            raise
+
+    def get_active_regions(self, regions: List[str]) -> List[str]:
+        """
+        Filters out regions which are known to be empty or inaccessible
+        """
+        account_id = self.credentials.get_account_id()
+        index = AWSRegionIndexDao.get_index(account_id)
+        ttl = self.interactive_ttl if self.interactive else self.ttl
+
+        active, to_probe = [], []
+        for region in regions:
+            if (activity := index.get(region)) and AWSRegionIndexDao.is_fresh(activity, ttl):
+                if activity.active:
+                    active.append(region)
+            else:
+                to_probe.append(region)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            probes = dict(zip(to_probe, executor.map(self._safe_probe, to_probe)))
+
+        # Index is updated from calling thread only
+        for region, (is_active, error_code) in probes.items():
+            if is_active is None:  # unexpected error, collect region in full
+                active.append(region)
+                continue
+            AWSRegionIndexDao.update(account_id, region, is_active, error_code)
+            if is_active:
+                active.append(region)
+
+        return [r for r in regions if r in active]
+
+    def _safe_probe(self, region: str) -> Tuple[Optional[bool], Optional[str]]:
+        try:
+            return self.probe_region(region)
+        except Exception as e:
+            logger.warning(f"Probing {region} region failed: {e}")
+            return None, None
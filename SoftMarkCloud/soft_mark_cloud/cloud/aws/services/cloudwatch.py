@@ -0,0 +1,93 @@
+import itertools
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from soft_mark_cloud.cloud.aws.core import AWSRegionalClient, AWSCreds
+
+
+@dataclass
+class S3BucketMetrics:
+    """
+    S3 bucket daily storage metrics
+    """
+    size: Optional[int] = None
+    object_count: Optional[int] = None
+
+
+class CloudWatchClient(AWSRegionalClient):
+    """
+    This class provides CloudWatch API functional
+    """
+    service_name = 'cloudwatch'
+    rate_limit = 50  # GetMetricData limit
+    max_concurrency = 10
+
+    max_queries = 500  # GetMetricData limit
+    # Every storage type BucketSizeBytes is reported for, including overheads of small and archived objects
+    s3_storage_types = ['StandardStorage', 'ReducedRedundancyStorage',
+                        'IntelligentTieringFAStorage', 'IntelligentTieringIAStorage', 'IntelligentTieringAAStorage',
+                        'IntelligentTieringAIAStorage', 'IntelligentTieringDAAStorage',
+                        'StandardIAStorage', 'StandardIASizeOverhead', 'StandardIAObjectOverhead',
+                        'OneZoneIAStorage', 'OneZoneIASizeOverhead',
+                        'GlacierInstantRetrievalStorage', 'GlacierIRSizeOverhead',
+                        'GlacierStorage', 'GlacierStagingStorage', 'GlacierObjectOverhead', 'GlacierS3ObjectOverhead',
+                        'DeepArchiveStorage', 'DeepArchiveStagingStorage', 'DeepArchiveObjectOverhead',
+                        'DeepArchiveS3ObjectOverhead', 'ExpressOneZone']
+
+    def __init__(self, credentials: AWSCreds, region_name: str):
+        super().__init__(credentials, region_name=region_name)
+
+    @staticmethod
+    def _s3_query(query_id: str, bucket_name: str, metric_name: str, storage_type: str) -> dict:
+        return {
+            'Id': query_id,
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': 'AWS/S3',
+                    'MetricName': metric_name,
+                    'Dimensions': [
+                        {'Name': 'BucketName', 'Value': bucket_name},
+                        {'Name': 'StorageType', 'Value': storage_type}
+                    ]
+                },
+                'Period': 24 * 60 * 60,
+                'Stat': 'Average'
+            },
+            'ReturnData': True
+        }
+
+    def get_s3_buckets_metrics(self, bucket_names: List[str]) -> Dict[str, S3BucketMetrics]:
+        """
+        Gets latest daily size and objects number of buckets located in client region.
+        Metrics of all buckets are requested in batches of `max_queries` queries
+        """
+        queries, targets = [], {}
+        for i, bucket_name in enumerate(bucket_names):
+            queries.append(self._s3_query(f'n{i}', bucket_name, 'NumberOfObjects', 'AllStorageTypes'))
+            targets[f'n{i}'] = (bucket_name, 'object_count')
+            for j, storage_type in enumerate(self.s3_storage_types):
+                queries.append(self._s3_query(f's{i}_{j}', bucket_name, 'BucketSizeBytes', storage_type))
+                targets[f's{i}_{j}'] = (bucket_name, 'size')
+
+        # S3 storage metrics are reported once a day, so the latest value within a few days is taken
+        end_time = datetime.now(tz=timezone.utc)
+        start_time = end_time - timedelta(days=3)
+
+        metrics = {name: S3BucketMetrics() for name in bucket_names}
+        seen = set()
+        queries = iter(queries)
+        while batch := list(itertools.islice(queries, self.max_queries)):
+            results = self.iter_items(
+                'get_metric_data', 'MetricDataResults[]',
+                MetricDataQueries=batch, StartTime=start_time, EndTime=end_time, ScanBy='TimestampDescending')
+            for result in results:
+                # Values of one query may continue on the next page, the first one is the latest
+                if not result.get('Values') or result['Id'] in seen:
+                    continue
+                seen.add(result['Id'])
+                bucket_name, attr = targets[result['Id']]
+                value = int(result['Values'][0])
+                setattr(metrics[bucket_name], attr, (getattr(metrics[bucket_name], attr) or 0) + value)
+
+        return metrics
@@ -31,6 +31,8 @@ class CostExplorerClient(AWSGlobalClient):
     This class provides S3 API functional
     """
     service_name = 'ce'
+    rate_limit = 5
+    max_concurrency = 2
 
     def get_cost_and_usage(self, start_date: datetime, end_date: datetime):
         query = {
@@ -2,7 +2,7 @@ import datetime
 
 from logging import getLogger
 from dataclasses import dataclass, field
-from typing import Iterator, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 from soft_mark_cloud.cloud.aws import PricingClient
 from soft_mark_cloud.cloud.aws.core import AWSRegionalClient, AWSCreds, AWSResource
@@ -122,11 +122,45 @@ class VPC(AWSResource):
             fields=fields)
 
 
+@dataclass
+class EC2RegionSnapshot:
+    """
+    EC2 resources of a single region joined together
+    """
+    vpcs: Dict[str, VPC]
+    subnets: Dict[str, Subnet]
+    instances: List[EC2Instance]
+
+    @classmethod
+    def build(
+            cls, vpcs: Iterable[VPC], subnets: Iterable[Subnet], instances: Iterable[EC2Instance]
+    ) -> 'EC2RegionSnapshot':
+        """
+        Joins instances to subnets by subnet id and subnets to VPCs by vpc id
+        """
+        snapshot = cls(
+            vpcs={vpc.id: vpc for vpc in vpcs},
+            subnets={subnet.subnet_id: subnet for subnet in subnets},
+            instances=list(instances))
+
+        for instance in snapshot.instances:
+            if subnet := snapshot.subnets.get(instance.subnet_id):
+                subnet.ec2_instances.append(instance)
+
+        for subnet in snapshot.subnets.values():
+            if vpc := snapshot.vpcs.get(subnet.vpc_id):
+                vpc.subnets.append(subnet)
+
+        return snapshot
+
+
 class EC2Client(AWSRegionalClient):
     """
     This class provides EC2 API functional
     """
     service_name = 'ec2'
+    rate_limit = 20  # EC2 non mutating actions bucket refill rate
+    max_concurrency = 10
 
     def __init__(self, credentials: AWSCreds, region_name: str):
         super().__init__(credentials, region_name=region_name)
@@ -137,23 +171,41 @@ class EC2Client(AWSRegionalClient):
         """
         return f'arn:aws:ec2:{self.region_name}:{self.account_id}:{resource_type}/{resource_id}'
 
+    def iter_subnets(self, filters: List[dict] = None) -> Iterator[Subnet]:
+        for subnet_data in self.iter_items('describe_subnets', 'Subnets[]', 'subnets', Filters=filters or []):
+            subnet_data['Arn'] = self.generate_arn('subnet', subnet_data['SubnetId'])
+            yield Subnet.from_api_dict(subnet_data)
+
     def list_subnets_for_vpc(self, vpc_id: str) -> List[Subnet]:
-        ec2_instances = list(self.describe_ec2_instances())
+        # We only search for subnets and instances that match the specified vpc
+        vpc_filters = [{'Name': 'vpc-id', 'Values': [vpc_id]}]
+        instances = list(self.describe_ec2_instances(filters=vpc_filters, with_prices=False))
+        self.set_ec2_instances_prices(instances)
+
+        snapshot = EC2RegionSnapshot.build(
+            vpcs=[],
+            subnets=self.iter_subnets(vpc_filters),
+            instances=instances)
+        return [*snapshot.subnets.values()]
+
+    def build_region_snapshot(self) -> EC2RegionSnapshot:
+        """
+        Builds snapshot of region EC2 resources. Makes one paginated call per resource type
+        regardless of the number of VPCs and subnets
+        """
+        vpcs = []
+        for vpc in self.iter_items('describe_vpcs', 'Vpcs[]', 'vpcs'):
+            vpc['Arn'] = self.generate_arn('vpc', vpc['VpcId'])
+            vpc['Subnets'] = []
+            vpcs.append(VPC.from_api_dict(vpc))
 
-        # Get subnet data from API. We only search for subnets that match the specified vpc
-        subnets = []
-        response = self.boto3_client.describe_subnets(
-            Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
+        instances = list(self.describe_ec2_instances(with_prices=False))
+        self.set_ec2_instances_prices(instances)
 
-        # Create subnet objects and attach EC2 instances
-        for subnet_data in response['Subnets']:
-            subnet_data['Arn'] = self.generate_arn('subnet', subnet_data['SubnetId'])
-            subnet_obj = Subnet.from_api_dict(subnet_data)
-            subnet_instances = [i for i in ec2_instances if i.subnet_id == subnet_obj.subnet_id]
-            subnet_obj.ec2_instances = subnet_instances
-            subnets.append(subnet_obj)
-
-        return subnets
+        return EC2RegionSnapshot.build(
+            vpcs=vpcs,
+            subnets=self.iter_subnets(),
+            instances=instances)
 
     def check_ec2_instance_initialized(self, instance_id: str) -> bool:
         resp = self.boto3_client.describe_instance_status(InstanceIds=[instance_id])
@@ -168,7 +220,9 @@ class EC2Client(AWSRegionalClient):
             return instances[0]
 
     # TODO: fetch more EC2 instances data
-    def describe_ec2_instances(self, *instance_ids: str) -> Iterator[EC2Instance]:
+    def describe_ec2_instances(
+            self, *instance_ids: str, filters: List[dict] = None, with_prices: bool = True
+    ) -> Iterator[EC2Instance]:
         """
         Collects ec2 instances for client region
 
@@ -187,19 +241,32 @@ class EC2Client(AWSRegionalClient):
         """
         self.credentials: AWSCreds
         pricing_client = PricingClient(self.credentials)
+        prices = {}
 
         kwargs = {}
         if instance_ids:
             kwargs.update({'InstanceIds': [*instance_ids]})
-
-        resp: dict = self.boto3_client.describe_instances(**kwargs)
-        for reservation_data in resp.get('Reservations', []):
-            for instance_data in reservation_data.get('Instances'):
-                instance_arn = self.generate_arn('instance', instance_data['InstanceId'])
-                instance_data['InstanceArn'] = instance_arn
-                ec2_instance = EC2Instance.from_api_dict(instance_data)
-                ec2_instance.price_per_hour = pricing_client.get_ec2_instance_price(ec2_instance.instance_type)
-                yield ec2_instance
+        if filters:
+            kwargs.update({'Filters': filters})
+
+        for instance_data in self.iter_items('describe_instances', 'Reservations[].Instances[]', 'instances', **kwargs):
+            instance_arn = self.generate_arn('instance', instance_data['InstanceId'])
+            instance_data['InstanceArn'] = instance_arn
+            ec2_instance = EC2Instance.from_api_dict(instance_data)
+            if with_prices:
+                if ec2_instance.instance_type not in prices:
+                    prices[ec2_instance.instance_type] = pricing_client.get_ec2_instance_price(
+                        ec2_instance.instance_type)
+                ec2_instance.price_per_hour = prices[ec2_instance.instance_type]
+            yield ec2_instance
+
+    def set_ec2_instances_prices(self, instances: List[EC2Instance]):
+        """
+        Resolves prices of distinct instance types in a single batch
+        """
+        prices = PricingClient(self.credentials).get_ec2_instance_prices(i.instance_type for i in instances)
+        for instance in instances:
+            instance.price_per_hour = prices[instance.instance_type]
 
     def describe_vpc(self) -> Iterator[VPC]:
         """
@@ -218,11 +285,7 @@ class EC2Client(AWSRegionalClient):
         out:
             List of vpc with corresponding subnets.
         """
-        response = self.boto3_client.describe_vpcs()
-        for vpc in response['Vpcs']:
-            vpc['Arn'] = self.generate_arn('vpc', vpc['VpcId'])
-            vpc['Subnets'] = self.list_subnets_for_vpc(vpc['VpcId'])
-            yield VPC.from_api_dict(vpc)
+        yield from self.build_region_snapshot().vpcs.values()
 
     def collect_resources(self):
         logger.info(f"Receiving EC2 data for {self.region_name} region")
@@ -1,7 +1,9 @@
 import json
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
 from soft_mark_cloud.cloud.aws import AWSRegionalClient, AWSCreds
+from soft_mark_cloud.cloud.aws.prices import AWSPriceCache
+from soft_mark_cloud.cloud.aws.price_list import AWSPriceListIndex
 
 
 class PricingClient(AWSRegionalClient):
@@ -9,13 +11,15 @@ class PricingClient(AWSRegionalClient):
     This class provides Pricing API functional
     """
     service_name = 'pricing'
+    rate_limit = 5
+    max_concurrency = 4
 
     def __init__(self, credentials: AWSCreds, region_name: str = None):
         super().__init__(credentials, region_name='us-east-1')
 
-    def get_resource_price(self, service_code, filters) -> Optional[float]:
+    def request_resource_price(self, service_code: str, filters: List[dict]) -> Optional[float]:
         """
-        Gets price per hour for resource
+        Requests price per hour for resource from Pricing API
         """
         resp = self.boto3_client.get_products(
             ServiceCode=service_code,
@@ -29,11 +33,34 @@ class PricingClient(AWSRegionalClient):
             price = price_dimensions[key]['pricePerUnit']['USD']
             return float(price)
 
-    def get_ec2_instance_price(self, instance_type: str) -> float:
+    def get_resource_prices(self, service_code: str, filters: Dict[str, List[dict]]) -> Dict[str, Optional[float]]:
         """
-        Gets price per hour for ec2 instance
+        Gets prices per hour for batch of resources. Cached prices are resolved at once, missed ones are looked up
+        in local price list index and Pricing API is only requested for the rest
         """
-        filters = [
+        keys = {name: AWSPriceCache.make_key(service_code, f, self.region_name) for name, f in filters.items()}
+        cached = AWSPriceCache.get_many(keys.values())
+
+        prices = {}
+        for name, resource_filters in filters.items():
+            if (price := cached.get(keys[name])) is None:
+                price = AWSPriceListIndex.lookup(service_code, resource_filters)
+                if price is None:
+                    price = self.request_resource_price(service_code, resource_filters)
+                if price is not None:
+                    AWSPriceCache.set(service_code, resource_filters, self.region_name, price)
+            prices[name] = price
+        return prices
+
+    def get_resource_price(self, service_code: str, filters: List[dict]) -> Optional[float]:
+        """
+        Gets price per hour for resource
+        """
+        return self.get_resource_prices(service_code, {'resource': filters})['resource']
+
+    @staticmethod
+    def ec2_instance_filters(instance_type: str) -> List[dict]:
+        return [
             {
                 'Type': 'TERM_MATCH',
                 'Field': 'instanceType',
@@ -50,9 +77,22 @@ class PricingClient(AWSRegionalClient):
                 'Value': 'Used'
             }
         ]
+
+    def get_ec2_instance_price(self, instance_type: str) -> float:
+        """
+        Gets price per hour for ec2 instance
+        """
         return self.get_resource_price(
             service_code='AmazonEC2',
-            filters=filters)
+            filters=self.ec2_instance_filters(instance_type))
+
+    def get_ec2_instance_prices(self, instance_types: Iterable[str]) -> Dict[str, float]:
+        """
+        Gets prices per hour for every distinct ec2 instance type
+        """
+        return self.get_resource_prices(
+            service_code='AmazonEC2',
+            filters={t: self.ec2_instance_filters(t) for t in set(instance_types)})
 
     def get_s3_bucket_price(self, bucket_size_gb: float) -> float:
         """
@@ -1,11 +1,20 @@
+import heapq
 import datetime
+from array import array
 
 from logging import getLogger
 from dataclasses import dataclass, field
-from typing import Iterator, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+from django.db import connections
 
 from soft_mark_cloud.cloud.aws.core import AWSGlobalClient, AWSCreds, AWSResource
+from soft_mark_cloud.cloud.aws.pool import AWSClientPool
 from soft_mark_cloud.cloud.aws.services.pricing import PricingClient
+from soft_mark_cloud.cloud.aws.services.cloudwatch import CloudWatchClient, S3BucketMetrics
 
 from humanize import naturalsize
 
@@ -48,6 +57,105 @@ class S3BucketObject:
         return self.domain.json
 
 
+class S3BucketContents:
+    """
+    Compact columnar container of bucket objects.
+
+    Keys are packed into a single utf-8 buffer addressed by offsets, sizes and modification times (epoch
+    microseconds, UTC) are kept in int64 arrays. `S3BucketObject` instances are only built on access.
+
+    Examples
+    --------
+    >>> contents = S3BucketContents(client.iter_s3_bucket_contents('my-bucket'))
+    >>> contents.total_size
+    >>> [obj.key for obj in contents.top(10, by='last_modified')]
+    """
+    columns = ('size', 'last_modified')
+    _epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def __init__(self, objects: Iterable[S3BucketObject] = ()):
+        self._keys = bytearray()
+        self._offsets = array('q', [0])
+        self.sizes = array('q')
+        self.last_modified = array('q')
+
+        for obj in objects:
+            self.append(obj.key, obj.size, obj.last_modified)
+
+    @classmethod
+    def from_api_dicts(cls, bucket_contents: Iterable[dict]) -> 'S3BucketContents':
+        contents = cls()
+        for bucket_content in bucket_contents:
+            contents.append(bucket_content['Key'], bucket_content['Size'], bucket_content['LastModified'])
+        return contents
+
+    def append(self, key: str, size: int, last_modified: datetime.datetime):
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+
+        self._keys += key.encode()
+        self._offsets.append(len(self._keys))
+        self.sizes.append(size)
+        self.last_modified.append((last_modified - self._epoch) // datetime.timedelta(microseconds=1))
+
+    def key(self, index: int) -> str:
+        return self._keys[self._offsets[index]:self._offsets[index + 1]].decode()
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def __getitem__(self, index: int) -> S3BucketObject:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('S3BucketContents index out of range')
+
+        return S3BucketObject(
+            key=self.key(index),
+            size=self.sizes[index],
+            last_modified=self._epoch + datetime.timedelta(microseconds=self.last_modified[index]))
+
+    def __iter__(self) -> Iterator[S3BucketObject]:
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def total_size(self) -> int:
+        return sum(self.sizes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory used by packed data
+        """
+        arrays = (self._offsets, self.sizes, self.last_modified)
+        return len(self._keys) + sum(a.itemsize * len(a) for a in arrays)
+
+    def _column(self, by: str) -> array:
+        if by not in self.columns:
+            raise ValueError(f'Can`t order contents by {by}, expected one of {self.columns}')
+        return self.sizes if by == 'size' else self.last_modified
+
+    def _take(self, indexes: Iterable[int]) -> 'S3BucketContents':
+        contents = S3BucketContents()
+        for i in indexes:
+            contents._keys += self._keys[self._offsets[i]:self._offsets[i + 1]]
+            contents._offsets.append(len(contents._keys))
+            contents.sizes.append(self.sizes[i])
+            contents.last_modified.append(self.last_modified[i])
+        return contents
+
+    def sorted(self, by: str = 'size', reverse: bool = True) -> 'S3BucketContents':
+        column = self._column(by)
+        return self._take(sorted(range(len(self)), key=column.__getitem__, reverse=reverse))
+
+    def top(self, n: int, by: str = 'size') -> 'S3BucketContents':
+        """
+        Gets `n` largest (by size) or newest (by last_modified) objects
+        """
+        column = self._column(by)
+        return self._take(heapq.nlargest(n, range(len(self)), key=column.__getitem__))
+
+
 @dataclass
 class S3Bucket(AWSResource):
     """
@@ -56,7 +164,9 @@ class S3Bucket(AWSResource):
     name: str
     creation_date: datetime.datetime
     price_per_hour: float = None
-    bucket_contents: List[S3BucketObject] = field(default_factory=list)
+    bucket_contents: S3BucketContents = field(default_factory=S3BucketContents)
+    size: Optional[int] = None  # set when contents are summarized instead of being fully listed
+    object_count: Optional[int] = None
 
     @property
     def price_per_month(self):
@@ -64,7 +174,9 @@ class S3Bucket(AWSResource):
 
     @property
     def bucket_size(self) -> int:
-        return sum(bc.size for bc in self.bucket_contents)
+        if self.size is not None:
+            return self.size
+        return self.bucket_contents.total_size
 
     @property
     def bucket_size_gb(self) -> float:
@@ -84,6 +196,7 @@ class S3Bucket(AWSResource):
             StringField('Name', self.name),
             StringField('Created at', self.creation_date.isoformat()),
             StringField('Size', naturalsize(self.bucket_size)),
+            *([StringField('Objects', self.object_count)] if self.object_count is not None else []),
             StringField('Price per month', f'{round(self.price_per_month, 2)} $'),
             ItemsField('Contents', [bc.domain for bc in self.bucket_contents])
         ]
@@ -98,13 +211,116 @@ class S3Client(AWSGlobalClient):
     This class provides S3 API functional
     """
     service_name = 's3'
+    max_concurrency = 32
+
+    summary = False  # take buckets size from CloudWatch metrics instead of listing all objects
+    contents_limit: Optional[int] = None  # number of stored objects per bucket, no limit by default
+    contents_order = 'largest'  # 'largest' or 'newest', objects kept when contents are limited
 
-    def __init__(self, credentials: AWSCreds):
+    bucket_workers = 8  # number of buckets listed simultaneously
+
+    def __init__(
+            self, credentials: AWSCreds, summary: bool = None, contents_limit: int = None, contents_order: str = None
+    ):
         super().__init__(credentials)
+        if summary is not None:
+            self.summary = summary
+        if contents_limit is not None:
+            self.contents_limit = contents_limit
+        if contents_order is not None:
+            self.contents_order = contents_order
+        # Regions are cached for a single collection only, buckets may be deleted and recreated elsewhere
+        self._bucket_regions: Dict[str, str] = {}
+
+    def get_bucket_region(self, bucket_name: str) -> Optional[str]:
+        """
+        Gets bucket region. Regions are cached per bucket by client
+        """
+        if (region := self._bucket_regions.get(bucket_name)) is None:
+            try:
+                location = self.boto3_client.get_bucket_location(Bucket=bucket_name).get('LocationConstraint')
+            except ClientError as e:
+                logger.warning(f"Can`t get {bucket_name} bucket location: {e}")
+                return None
+
+            # Buckets in us-east-1 have no location constraint, 'EU' is legacy alias of eu-west-1
+            region = {None: 'us-east-1', '': 'us-east-1', 'EU': 'eu-west-1'}.get(location, location)
+            self._bucket_regions[bucket_name] = region
+        return region
+
+    def get_bucket_client(self, bucket_name: str) -> BaseClient:
+        """
+        Gets client of bucket region, so requests aren't redirected. Falls back to global client
+        """
+        if region := self.get_bucket_region(bucket_name):
+            return AWSClientPool.get_client(self.credentials, self.service_name, region)
+        return self.boto3_client
+
+    def get_buckets_metrics(self, buckets: List[S3Bucket]) -> Dict[str, S3BucketMetrics]:
+        """
+        Gets CloudWatch storage metrics of buckets grouped by bucket region
+        """
+        by_region: Dict[str, List[str]] = {}
+        for bucket in buckets:
+            if region := self.get_bucket_region(bucket.name):
+                by_region.setdefault(region, []).append(bucket.name)
+
+        metrics = {}
+        for region, bucket_names in by_region.items():
+            metrics.update(CloudWatchClient(self.credentials, region).get_s3_buckets_metrics(bucket_names))
+        return metrics
 
-    def list_s3_buckets_contents(self, bucket_name) -> List[S3BucketObject]:
-        contents = self.boto3_client.list_objects(Bucket=bucket_name)
-        return [S3BucketObject.from_api_dict(bucket_content) for bucket_content in contents.get('Contents', [])]
+    def iter_s3_bucket_contents(self, bucket_name: str) -> Iterator[S3BucketObject]:
+        bucket_contents = self.iter_items(
+            'list_objects_v2', 'Contents[]', 'objects', client=self.get_bucket_client(bucket_name), Bucket=bucket_name)
+        for bucket_content in bucket_contents:
+            yield S3BucketObject.from_api_dict(bucket_content)
+
+    def list_s3_buckets_contents(self, bucket_name: str) -> S3BucketContents:
+        return S3BucketContents.from_api_dicts(self.iter_items(
+            'list_objects_v2', 'Contents[]', 'objects', client=self.get_bucket_client(bucket_name), Bucket=bucket_name))
+
+    def summarize_s3_bucket_contents(self, bucket: S3Bucket, limit: Optional[int]):
+        """
+        Streams bucket contents summing size and number of objects.
+        Only top `limit` objects by `contents_order` are kept
+        """
+        sort_key = (lambda o: o.size) if self.contents_order == 'largest' else (lambda o: o.last_modified)
+
+        size, count, top = 0, 0, []
+        for obj in self.iter_s3_bucket_contents(bucket.name):
+            size += obj.size
+            count += 1
+            if limit:
+                item = (sort_key(obj), count, obj)
+                if len(top) < limit:
+                    heapq.heappush(top, item)
+                else:
+                    heapq.heappushpop(top, item)
+
+        bucket.size, bucket.object_count = size, count
+        bucket.bucket_contents = S3BucketContents(obj for *_, obj in sorted(top, reverse=True))
+
+    def fill_s3_bucket_contents(self, bucket: S3Bucket, metrics: S3BucketMetrics = None):
+        """
+        Fills bucket contents and size according to client mode.
+
+        Objects are listed in full unless contents are limited. In summary mode size is taken from metrics,
+        objects are only listed if metrics are missing or contents limit is specified
+        """
+        if not self.summary:
+            if self.contents_limit is None:
+                bucket.bucket_contents = self.list_s3_buckets_contents(bucket.name)
+            else:
+                self.summarize_s3_bucket_contents(bucket, self.contents_limit)
+            return
+
+        if metrics and metrics.size is not None:
+            if self.contents_limit:
+                self.summarize_s3_bucket_contents(bucket, self.contents_limit)
+            bucket.size, bucket.object_count = metrics.size, metrics.object_count
+        else:
+            self.summarize_s3_bucket_contents(bucket, self.contents_limit)
 
     def list_s3_buckets(self) -> Iterator[S3Bucket]:
         """
@@ -126,12 +342,23 @@ class S3Client(AWSGlobalClient):
         self.credentials: AWSCreds
         pricing_client = PricingClient(self.credentials)
 
-        resp: dict = self.boto3_client.list_buckets()
-        for bucket_dict in resp['Buckets']:
-            s3_bucket = S3Bucket.from_api_dict(bucket_dict)
-            s3_bucket.bucket_contents = self.list_s3_buckets_contents(s3_bucket.name)
-            s3_bucket.price_per_hour = pricing_client.get_s3_bucket_price(s3_bucket.bucket_size_gb)
-            yield s3_bucket
+        def _collect_bucket(s3_bucket: S3Bucket, bucket_metrics: Optional[S3BucketMetrics]) -> S3Bucket:
+            try:
+                self.fill_s3_bucket_contents(s3_bucket, bucket_metrics)
+                s3_bucket.price_per_hour = pricing_client.get_s3_bucket_price(s3_bucket.bucket_size_gb)
+                return s3_bucket
+            finally:
+                connections.close_all()  # prices cache touches db from worker thread
+
+        buckets = [S3Bucket.from_api_dict(b) for b in self.iter_items('list_buckets', 'Buckets[]', 'buckets')]
+
+        # Buckets are listed in parallel and yielded in listing order, so output is stable between runs
+        with ThreadPoolExecutor(max_workers=self.bucket_workers) as executor:
+            # Resolve (and cache) regions in parallel, they are needed both for metrics and regional clients
+            list(executor.map(self.get_bucket_region, [b.name for b in buckets]))
+            metrics = self.get_buckets_metrics(buckets) if self.summary else {}
+
+            yield from executor.map(_collect_bucket, buckets, [metrics.get(b.name) for b in buckets])
 
     def collect_resources(self) -> List[S3Bucket]:
         logger.info(f"Receiving s3 buckets")
@@ -0,0 +1,231 @@
+from logging import getLogger
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from soft_mark_cloud.codec import Payload
+from soft_mark_cloud.models import AWSInventoryChange, AWSInventoryResource, AWSInventorySnapshot, User
+from soft_mark_cloud.cloud.aws.inventory import AWSInventoryDao
+
+
+logger = getLogger(__name__)
+
+
+class AWSSnapshotDao:
+    """
+    History of user inventory.
+
+    Every collection that changed inventory is stored as snapshot holding only changes against previous snapshot,
+    keyed by resource arn and compared by content hash. Every `keyframe_interval` snapshot is a keyframe which
+    holds unchanged resources too, so inventory at any point is rebuilt from the nearest keyframe and a bounded
+    number of deltas. Compaction turns keyframes older than `compact_after` back into deltas, keeping one every
+    `compacted_keyframe_interval` snapshots, so storage grows with the rate of change rather than account size.
+
+    Examples
+    --------
+    >>> AWSSnapshotDao.take_snapshot(user)
+    >>> AWSSnapshotDao.get_history(user, 'arn:aws:ec2:eu-central-1:123456789012:instance/i-0123')
+    [(datetime(2024, 1, 1, ...), 'added'), (datetime(2024, 1, 5, ...), 'updated')]
+    >>> AWSSnapshotDao.get_data_at(user, datetime(2024, 1, 3, tzinfo=timezone.utc))
+    """
+    Change = AWSInventoryChange.Change
+
+    keyframe_interval = 20
+    compact_after = timedelta(days=7)
+    compacted_keyframe_interval = 200
+    batch_size = 1000
+    lookup_size = 500  # arns per `IN` lookup
+
+    @classmethod
+    def get_snapshot(cls, user: User, at: datetime = None) -> Optional[AWSInventorySnapshot]:
+        """
+        Gets latest snapshot taken at or before `at`, latest snapshot by default
+        """
+        snapshots = AWSInventorySnapshot.objects.filter(user=user)
+        if at is not None:
+            snapshots = snapshots.filter(created_at__lte=at)
+        return snapshots.order_by('-id').first()
+
+    @classmethod
+    def get_keyframe(cls, snapshot: AWSInventorySnapshot) -> AWSInventorySnapshot:
+        return AWSInventorySnapshot.objects.filter(
+            user_id=snapshot.user_id, keyframe=True, id__lte=snapshot.id).order_by('-id').first()
+
+    @classmethod
+    def get_chain(cls, snapshot: AWSInventorySnapshot):
+        """
+        Gets changes of snapshot and of snapshots since its keyframe in order they were made
+        """
+        keyframe = cls.get_keyframe(snapshot)
+        return AWSInventoryChange.objects.filter(
+            snapshot__user_id=snapshot.user_id, snapshot_id__gte=keyframe.id, snapshot_id__lte=snapshot.id
+        ).order_by('snapshot_id', 'id')
+
+    @classmethod
+    def get_hashes(cls, snapshot: AWSInventorySnapshot) -> Dict[str, str]:
+        """
+        Gets content hash of every resource by arn at snapshot
+        """
+        hashes = {}
+        changes = cls.get_chain(snapshot).values_list('arn', 'change', 'content_hash')
+        for arn, change, content_hash in changes.iterator(chunk_size=cls.batch_size):
+            if change == cls.Change.REMOVED:
+                hashes.pop(arn, None)
+            else:
+                hashes[arn] = content_hash
+        return hashes
+
+    @classmethod
+    def get_state(cls, snapshot: AWSInventorySnapshot) -> Dict[str, AWSInventoryChange]:
+        """
+        Gets latest change of every resource by arn at snapshot
+        """
+        state = {}
+        for change in cls.get_chain(snapshot).iterator(chunk_size=cls.batch_size):
+            if change.change == cls.Change.REMOVED:
+                state.pop(change.arn, None)
+            else:
+                state[change.arn] = change
+        return state
+
+    @classmethod
+    def _iter_resources(cls, user: User, arns: Optional[List[str]]) -> Iterable[AWSInventoryResource]:
+        resources = AWSInventoryResource.objects.filter(user=user)
+        if arns is None:
+            yield from resources.iterator(chunk_size=cls.batch_size)
+            return
+        for i in range(0, len(arns), cls.lookup_size):
+            yield from resources.filter(arn__in=arns[i:i + cls.lookup_size])
+
+    @classmethod
+    def _bulk_create(cls, changes: Iterable[AWSInventoryChange]):
+        batch = []
+        for change in changes:
+            batch.append(change)
+            if len(batch) >= cls.batch_size:
+                AWSInventoryChange.objects.bulk_create(batch)
+                batch = []
+        AWSInventoryChange.objects.bulk_create(batch)
+
+    @classmethod
+    def take_snapshot(cls, user: User) -> Optional[AWSInventorySnapshot]:
+        """
+        Stores current inventory as snapshot. Nothing is stored if inventory hasn't changed since previous one
+        """
+        current = dict(AWSInventoryResource.objects.filter(user=user).values_list('arn', 'content_hash'))
+
+        previous = cls.get_snapshot(user)
+        previous_hashes = cls.get_hashes(previous) if previous else {}
+
+        changes = {arn: cls.Change.ADDED for arn in current.keys() - previous_hashes.keys()}
+        changes.update({
+            arn: cls.Change.UPDATED for arn, content_hash in current.items()
+            if arn in previous_hashes and previous_hashes[arn] != content_hash
+        })
+        removed = previous_hashes.keys() - current.keys()
+
+        keyframe = previous is None or (
+            AWSInventorySnapshot.objects.filter(
+                user=user, id__gt=cls.get_keyframe(previous).id).count() + 1 >= cls.keyframe_interval)
+        if not keyframe and not changes and not removed:
+            return previous
+
+        with transaction.atomic():
+            snapshot = AWSInventorySnapshot.objects.create(user=user, keyframe=keyframe, resources=len(current))
+            cls._bulk_create(
+                AWSInventoryChange(
+                    snapshot=snapshot,
+                    arn=resource.arn,
+                    change=changes.get(resource.arn, cls.Change.PRESENT),
+                    content_hash=resource.content_hash,
+                    content_json=Payload.dumps(AWSInventoryDao.get_content(resource)))
+                for resource in cls._iter_resources(user, None if keyframe else list(changes)))
+            cls._bulk_create(
+                AWSInventoryChange(snapshot=snapshot, arn=arn, change=cls.Change.REMOVED) for arn in removed)
+
+        logger.info(
+            f"Inventory snapshot of {user} taken{' as keyframe' if keyframe else ''}: "
+            f"{len(changes)} changed, {len(removed)} removed")
+
+        if keyframe:
+            cls.compact(user)
+        return snapshot
+
+    @classmethod
+    def get_history(cls, user: User, arn: str) -> List[Tuple[datetime, str]]:
+        """
+        Gets (snapshot time, change) of every change of resource, e.g. when it has appeared
+        """
+        changes = AWSInventoryChange.objects.filter(snapshot__user=user, arn=arn).exclude(
+            change=cls.Change.PRESENT).order_by('snapshot_id').values_list('snapshot__created_at', 'change')
+        return list(changes)
+
+    @classmethod
+    def get_data_at(cls, user: User, at: datetime) -> dict:
+        """
+        Rebuilds collected data as it was at specified time. Empty dict if no snapshot was taken before
+        """
+        if (snapshot := cls.get_snapshot(user, at)) is None:
+            return {}
+
+        rows = [AWSInventoryDao.from_content(arn, change.content) for arn, change in cls.get_state(snapshot).items()]
+        rows.sort(key=lambda row: (row.region or '', row.service_name, row.position))
+        return AWSInventoryDao.build_data(rows)[0]
+
+    @classmethod
+    def make_keyframe(cls, snapshot: AWSInventorySnapshot):
+        """
+        Adds unchanged resources to snapshot, so it doesn't depend on previous snapshots
+        """
+        if snapshot.keyframe:
+            return
+
+        changed = set(snapshot.changes.values_list('arn', flat=True))
+        state = cls.get_state(snapshot)
+        with transaction.atomic():
+            cls._bulk_create(
+                AWSInventoryChange(
+                    snapshot=snapshot, arn=arn, change=cls.Change.PRESENT, content_hash=change.content_hash,
+                    content_json=change.content_json)
+                for arn, change in state.items() if arn not in changed)
+            snapshot.keyframe = True
+            snapshot.save(update_fields=['keyframe'])
+
+    @classmethod
+    def compact(cls, user: User, now: datetime = None) -> int:
+        """
+        Turns keyframes older than `compact_after` into deltas, except one every `compacted_keyframe_interval`
+        snapshots. Gets number of compacted keyframes
+        """
+        cutoff = (now or datetime.now(tz=timezone.utc)) - cls.compact_after
+        old = AWSInventorySnapshot.objects.filter(user=user, created_at__lt=cutoff).order_by('id')
+        positions = {snapshot_id: i for i, snapshot_id in enumerate(old.values_list('id', flat=True))}
+
+        compacted, kept = 0, None
+        for keyframe in old.filter(keyframe=True):
+            if kept is None or positions[keyframe.id] - positions[kept.id] >= cls.compacted_keyframe_interval:
+                kept = keyframe
+                continue
+
+            with transaction.atomic():
+                keyframe.changes.filter(change=cls.Change.PRESENT).delete()
+                keyframe.keyframe = False
+                keyframe.save(update_fields=['keyframe'])
+            compacted += 1
+        return compacted
+
+    @classmethod
+    def expire(cls, user: User, before: datetime) -> int:
+        """
+        Deletes snapshots taken before specified time. Latest snapshot is always kept. Gets number of deleted
+        snapshots
+        """
+        snapshots = AWSInventorySnapshot.objects.filter(user=user)
+        if (first := snapshots.filter(created_at__gte=before).order_by('id').first()) is None:
+            if (first := cls.get_snapshot(user)) is None:
+                return 0
+
+        cls.make_keyframe(first)
+        _, deleted = AWSInventorySnapshot.objects.filter(user=user, id__lt=first.id).delete()
+        return deleted.get(AWSInventorySnapshot._meta.label, 0)
@@ -1,39 +1,103 @@
+import copy
 import json
+import time
+import asyncio
+import threading
+from logging import getLogger
 from typing import Optional, Union
 from datetime import datetime, timedelta, timezone
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, connection
+from django.db.models import Q, QuerySet
 
+from soft_mark_cloud.codec import Payload
+from soft_mark_cloud.cloud.memory_cache import ReadThroughCache
 from soft_mark_cloud.models import AWSProcessStatus, User
 
 
+logger = getLogger(__name__)
+
+
 class AWSStatusDao:
+    heartbeat_interval = 10  # seconds between heartbeats of running process
+    heartbeat_timeout = 60  # seconds without heartbeat after which process is considered dead
+
+    read_cache = ReadThroughCache('aws_status')  # statuses grouped by user
+
     @classmethod
-    def get_status(cls, user: User, process_name: str) -> Optional[AWSProcessStatus]:
+    def _load_status(cls, user: User, process_name: str):
         try:
-            return AWSProcessStatus.objects.get(user=user, process_name=process_name)
+            status = AWSProcessStatus.objects.get(user=user, process_name=process_name)
+            status.details  # decoded once while cached
+            return status, len(status.details_json or '') + 1024
         except ObjectDoesNotExist:
-            return None
+            return None, 0
+
+    @classmethod
+    def get_status(cls, user: User, process_name: str) -> Optional[AWSProcessStatus]:
+        """
+        Gets status of user process. Unchanged status is read from memory, every call gets its own instance
+        """
+        status = cls.read_cache.get(user.pk, process_name, lambda: cls._load_status(user, process_name))
+        return copy.copy(status) if status else None
+
+    @classmethod
+    def invalidate(cls, user_id: int, version=None):
+        cls.read_cache.invalidate(user_id, version)
 
     @classmethod
-    def is_expired(cls, status: AWSProcessStatus, expiration_time: int):
+    def is_expired(cls, status: AWSProcessStatus, timeout: int = None):
+        """
+        Checks whether running process has missed heartbeats for `timeout` seconds
+        """
         if not status.done and not status.failed:
-            if status.created_at + timedelta(seconds=expiration_time) < datetime.now(tz=timezone.utc):
+            last_seen = status.heartbeat_at or status.created_at
+            if last_seen + timedelta(seconds=timeout or cls.heartbeat_timeout) < datetime.now(tz=timezone.utc):
                 return True
         return False
 
     @classmethod
-    def check_expired(cls, status: AWSProcessStatus, expiration_time: int):
-        if cls.is_expired(status, expiration_time):
+    def check_expired(cls, status: AWSProcessStatus, timeout: int = None):
+        if cls.is_expired(status, timeout):
             status.failed = True
-            status.save()
+            status.save(update_fields=['failed', 'updated_at'])
+            cls.invalidate(status.user_id, status.updated_at)
         return status
 
+    @classmethod
+    def get_expired_statuses(cls, timeout: int = None) -> QuerySet:
+        """
+        Gets running processes which have missed heartbeats for `timeout` seconds
+        """
+        dead_since = datetime.now(tz=timezone.utc) - timedelta(seconds=timeout or cls.heartbeat_timeout)
+        return AWSProcessStatus.objects.filter(done=False, failed=False).filter(
+            Q(heartbeat_at__lt=dead_since) | Q(heartbeat_at__isnull=True, created_at__lt=dead_since))
+
+    @classmethod
+    def fail_statuses(cls, statuses: QuerySet) -> int:
+        user_ids = set(statuses.values_list('user_id', flat=True))
+        count = statuses.update(failed=True)
+        for user_id in user_ids:
+            cls.invalidate(user_id)
+        return count
+
+    @classmethod
+    def heartbeat(cls, status: AWSProcessStatus):
+        """
+        Marks process alive. Only heartbeat is updated, so concurrent updates of status aren't overwritten
+        """
+        status.heartbeat_at = datetime.now(tz=timezone.utc)
+        AWSProcessStatus.objects.filter(pk=status.pk).update(heartbeat_at=status.heartbeat_at)
+        cls.invalidate(status.user_id, status.heartbeat_at)
+
     @classmethod
     def delete_status(cls, user: User, process_name: str):
         try:
             status = AWSProcessStatus.objects.get(user=user, process_name=process_name)
             status.delete()
+            cls.invalidate(user.pk)
         except ObjectDoesNotExist:
             return None
 
@@ -42,27 +106,48 @@ class AWSStatusDao:
         try:
             status = AWSProcessStatus.objects.filter(user=user)
             status.delete()
+            cls.invalidate(user.pk)
         except ObjectDoesNotExist:
             return None
 
     @classmethod
     def update_status_state(cls, status: AWSProcessStatus, done: bool):
         status.done = done
-        status.save()
+        status.heartbeat_at = datetime.now(tz=timezone.utc)
+        status.save(update_fields=['done', 'heartbeat_at', 'updated_at'])
+        cls.invalidate(status.user_id, status.updated_at)
+
+    @classmethod
+    def reset_status_state(cls, status: AWSProcessStatus, details: Union[str, dict] = None):
+        """
+        Makes status of interrupted process running again
+        """
+        if isinstance(details, dict):
+            details = Payload.dumps(details)
+
+        status.done = False
+        status.failed = False
+        status.details_json = details
+        status.heartbeat_at = datetime.now(tz=timezone.utc)
+        status.save(update_fields=['done', 'failed', 'details_json', 'heartbeat_at', 'updated_at'])
+        cls.invalidate(status.user_id, status.updated_at)
+        return status
 
     @classmethod
     def update_status_details(cls, status: AWSProcessStatus, details: Union[str, dict]):
-        if details and isinstance(details, dict):
-            details = json.dumps(details, indent=4)
+        if isinstance(details, dict):
+            details = Payload.dumps(details)
 
         status.details_json = details
-        status.save()
+        status.heartbeat_at = datetime.now(tz=timezone.utc)  # progress is a heartbeat too
+        status.save(update_fields=['details_json', 'heartbeat_at', 'updated_at'])
+        cls.invalidate(status.user_id, status.updated_at)
         return status
 
     @classmethod
     def create_status(cls, user: User, process_name: str, details: Union[str, dict] = None) -> AWSProcessStatus:
-        if details and isinstance(details, dict):
-            details = json.dumps(details, indent=4)
+        if isinstance(details, dict):
+            details = Payload.dumps(details)
 
         if cls.get_status(user, process_name):
             cls.delete_status(user, process_name)
@@ -70,7 +155,148 @@ class AWSStatusDao:
         status = AWSProcessStatus(
             user=user,
             process_name=process_name,
-            details_json=details
+            details_json=details,
+            heartbeat_at=datetime.now(tz=timezone.utc)
         )
         status.save()
+        cls.invalidate(user.pk, status.updated_at)
         return status
+
+
+class AWSStatusHeartbeat:
+    """
+    Sends heartbeats of running process from background thread while in context, so long steps without progress
+    updates aren't taken for dead process. Heartbeats stop once process has run for `max_runtime` seconds, so
+    hung process expires like a dead one
+
+    Examples
+    --------
+    >>> status = AWSStatusDao.create_status(user=user, process_name=AWSCollector.process_name)
+    >>> with AWSStatusHeartbeat(status, max_runtime=AWSCollector.max_runtime):
+    ...     collect()
+    """
+    def __init__(self, status: AWSProcessStatus, interval: float = None, max_runtime: float = None):
+        self.status = status
+        self.interval = interval or AWSStatusDao.heartbeat_interval
+        self.max_runtime = max_runtime
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'heartbeat-{status.pk}', daemon=True)
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_runtime if self.max_runtime else None
+        try:
+            while not self._stopped.wait(self.interval):
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.warning(
+                        f"{self.status.process_name} has run for more than {self.max_runtime}s, heartbeats stopped")
+                    break
+                try:
+                    AWSStatusDao.heartbeat(self.status)
+                except DatabaseError as e:
+                    logger.warning(f"Heartbeat of {self.status.process_name} failed: {e}")
+        finally:
+            connection.close()  # thread's own connection
+
+    def __enter__(self) -> 'AWSStatusHeartbeat':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+class AWSStatusStream:
+    """
+    Server-Sent Events stream of process status. Event is sent whenever status changes, stream ends once process
+    is finished or after `timeout` seconds, browser reconnects in latter case. Status is read through memory cache,
+    so polling it is a cache lookup unless status has changed.
+
+    Stream is both async and sync iterable. Served by ASGI server, async stream waits between polls without
+    holding a thread. Sync stream holds a server thread while open, so it's meant for WSGI servers with short
+    `timeout` only.
+
+    Examples
+    --------
+    >>> stream = AWSStatusStream(user, AWSCollector.process_name)
+    >>> StreamingHttpResponse(aiter(stream), content_type='text/event-stream')
+    """
+    poll_interval = 1  # seconds
+    keepalive_interval = 15  # seconds
+    timeout = 60  # seconds
+    sync_timeout = 15  # seconds, sync stream holds server thread
+    retry = 2000  # milliseconds before browser reconnects
+
+    def __init__(self, user: User, process_name: str, timeout: int = None):
+        self.user = user
+        self.process_name = process_name
+        self.timeout = timeout or self.timeout
+        self._started_at = self._last_sent_at = time.monotonic()
+        self._last_event = None
+
+    @staticmethod
+    def get_event(status: Optional[AWSProcessStatus]) -> dict:
+        """
+        Gets status event. Only progress parts of details are sent, e.g. billing graph isn't
+        """
+        if status is None:
+            return {'exists': False, 'finished': True}
+
+        details = status.details if isinstance(status.details, dict) else {}
+        return {
+            'exists': True,
+            'done': status.done,
+            'failed': status.failed,
+            'finished': status.done or status.failed,
+            'progress': details.get('progress'),
+            'steps': details.get('steps'),
+            'url': details.get('url')
+        }
+
+    def get_status_event(self) -> dict:
+        if status := AWSStatusDao.get_status(self.user, self.process_name):
+            status = AWSStatusDao.check_expired(status)
+        return self.get_event(status)
+
+    def _start(self) -> str:
+        self._started_at = self._last_sent_at = time.monotonic()
+        self._last_event = None
+        return f'retry: {self.retry}\n\n'
+
+    def _get_chunk(self, event: dict) -> Optional[str]:
+        """
+        Gets chunk to send for polled event: event itself if it has changed, keepalive comment if nothing has been
+        sent for a while, None otherwise
+        """
+        now = time.monotonic()
+        if event != self._last_event:
+            self._last_event, self._last_sent_at = event, now
+            return f'event: status\ndata: {json.dumps(event)}\n\n'
+        if now - self._last_sent_at >= self.keepalive_interval:
+            self._last_sent_at = now
+            return ': keepalive\n\n'
+        return None
+
+    def _is_over(self, event: dict) -> bool:
+        return event['finished'] or time.monotonic() - self._started_at >= self.timeout
+
+    def __iter__(self):
+        yield self._start()
+        while True:
+            event = self.get_status_event()
+            if chunk := self._get_chunk(event):
+                yield chunk
+            if self._is_over(event):
+                return
+            time.sleep(self.poll_interval)
+
+    async def __aiter__(self):
+        yield self._start()
+        get_status_event = sync_to_async(self.get_status_event)
+        while True:
+            event = await get_status_event()
+            if chunk := self._get_chunk(event):
+                yield chunk
+            if self._is_over(event):
+                return
+            await asyncio.sleep(self.poll_interval)
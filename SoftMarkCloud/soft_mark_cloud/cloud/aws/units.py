@@ -0,0 +1,67 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+from soft_mark_cloud.codec import Payload
+from soft_mark_cloud.models import AWSCollectionUnit, AWSProcessStatus
+
+if TYPE_CHECKING:
+    from soft_mark_cloud.cloud.aws.collector import CollectionUnit, CollectionResult
+
+
+class AWSUnitDao:
+    """
+    Persisted collection units of a process, so interrupted runs are resumed from unfinished units
+    """
+    State = AWSCollectionUnit.State
+
+    @classmethod
+    def sync_units(cls, status: AWSProcessStatus, units: List['CollectionUnit']) -> Dict[str, AWSCollectionUnit]:
+        """
+        Gets unit rows of process by unit key. Missing rows are created pending, rows of units which are no longer
+        collected are dropped
+        """
+        rows = {row.key: row for row in AWSCollectionUnit.objects.filter(status=status)}
+        keys = {unit.key for unit in units}
+
+        if stale := [key for key in rows if key not in keys]:
+            AWSCollectionUnit.objects.filter(status=status, key__in=stale).delete()
+
+        AWSCollectionUnit.objects.bulk_create([
+            AWSCollectionUnit(status=status, key=unit.key, service_name=unit.service_name, region=unit.region)
+            for unit in units if unit.key not in rows
+        ])
+        return {row.key: row for row in AWSCollectionUnit.objects.filter(status=status)}
+
+    @classmethod
+    def has_unfinished(cls, status: AWSProcessStatus) -> bool:
+        return AWSCollectionUnit.objects.filter(status=status).exclude(state=cls.State.DONE).exists()
+
+    @classmethod
+    def reset_unfinished(cls, status: AWSProcessStatus):
+        """
+        Makes unfinished units of interrupted run pending again with fresh attempts
+        """
+        AWSCollectionUnit.objects.filter(status=status).exclude(state=cls.State.DONE).update(
+            state=cls.State.PENDING, attempts=0)
+
+    @classmethod
+    def mark_running(cls, rows: Iterable[AWSCollectionUnit]):
+        rows = list(rows)
+        AWSCollectionUnit.objects.filter(pk__in=[row.pk for row in rows]).update(state=cls.State.RUNNING)
+        for row in rows:
+            row.state = cls.State.RUNNING
+
+    @classmethod
+    def finish(cls, row: AWSCollectionUnit, result: 'CollectionResult') -> AWSCollectionUnit:
+        row.attempts += 1
+        row.state = cls.State.FAILED if result.failed else cls.State.DONE
+        row.error = result.error
+        row.data_json = Payload.dumps(result.data) if result.data is not None else None
+        row.save(update_fields=['attempts', 'state', 'error', 'data_json', 'updated_at'])
+        return row
+
+    @classmethod
+    def clear_data(cls, status: AWSProcessStatus):
+        """
+        Drops units data once it's saved to cache
+        """
+        AWSCollectionUnit.objects.filter(status=status).update(data_json=None)
@@ -0,0 +1,183 @@
+import os
+import signal
+import socket
+import multiprocessing
+from logging import getLogger
+from typing import Callable, Dict, Optional
+
+import django
+from django.db import DatabaseError, connections
+
+from soft_mark_cloud.models import AWSCredentials, AWSJob
+from soft_mark_cloud.cloud.aws.core import AWSCreds
+from soft_mark_cloud.cloud.aws.jobs import AWSJobQueue
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+from soft_mark_cloud.cloud.aws.billing import AWSBilling
+from soft_mark_cloud.cloud.aws.collector import AWSCollector
+from soft_mark_cloud.cloud.aws.deploy.terraform import AWSDeployer, TerraformSettings
+
+
+logger = getLogger(__name__)
+
+
+def _get_creds(job: AWSJob) -> AWSCreds:
+    return AWSCreds.from_model(AWSCredentials.objects.get(user=job.user))
+
+
+def run_collector(job: AWSJob):
+    interactive = job.priority == AWSJobQueue.Priority.INTERACTIVE
+    AWSCollector(credentials=_get_creds(job), interactive=interactive).run(
+        job.user, profile=job.profile, status=job.status)
+
+
+def run_billing(job: AWSJob):
+    AWSBilling(_get_creds(job)).run(job.user, profile=job.profile, status=job.status)
+
+
+def run_deployer(job: AWSJob):
+    settings = TerraformSettings(creds=_get_creds(job), **job.payload)
+    AWSDeployer(settings).deploy(job.user, profile=job.profile, status=job.status)
+
+
+class AWSWorkerPool:
+    """
+    Pool of worker processes running queued jobs.
+
+    Parent process keeps `workers` children alive, replacing those which have exited after `max_tasks_per_child`
+    jobs or have died, releases jobs of dead children and keeps statuses of queued jobs alive. Children claim
+    jobs one at a time, so a slow or crashed job holds a single worker. On SIGINT or SIGTERM children finish
+    their current jobs, those still running after `shutdown_timeout` are killed and their jobs are retried.
+
+    Examples
+    --------
+    >>> AWSWorkerPool(workers=4).run()
+    """
+    runners: Dict[str, Callable[[AWSJob], None]] = {
+        AWSCollector.process_name: run_collector,
+        AWSBilling.process_name: run_billing,
+        AWSDeployer.process_name: run_deployer,
+    }
+
+    def __init__(
+            self, workers: int = 2, max_tasks_per_child: int = 100, poll_interval: float = 1,
+            shutdown_timeout: float = 30
+    ):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.poll_interval = poll_interval
+        self.shutdown_timeout = shutdown_timeout
+        self._stopped = multiprocessing.Event()
+        self._children: Dict[int, multiprocessing.Process] = {}
+
+    @staticmethod
+    def get_worker_name(pid: int = None) -> str:
+        return f'{socket.gethostname()}:{pid or os.getpid()}'
+
+    @classmethod
+    def run_job(cls, job: AWSJob):
+        """
+        Runs claimed job and finishes it with error if runner has failed
+        """
+        logger.info(f"Job {job.pk} {job.process_name} of {job.user} started, attempt {job.attempts}")
+        error = None
+        try:
+            if (runner := cls.runners.get(job.process_name)) is None:
+                raise ValueError(f'Unknown process {job.process_name}')
+            if job.status.failed:  # expired while queued
+                AWSStatusDao.reset_status_state(job.status, job.status.details_json)
+            runner(job)
+        except Exception as e:
+            logger.exception(f"Job {job.pk} {job.process_name} of {job.user} failed")
+            error = f'{type(e).__name__}: {e}'
+        AWSJobQueue.finish(job, error)
+
+    @classmethod
+    def child_main(cls, stopped: multiprocessing.Event, max_tasks: int, poll_interval: float):
+        django.setup()
+        connections.close_all()  # connections inherited from parent are never shared
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # parent decides when to stop
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+        worker, tasks = cls.get_worker_name(), 0
+        while not stopped.is_set() and tasks < max_tasks:
+            try:
+                job = AWSJobQueue.claim(worker)
+            except DatabaseError as e:
+                logger.warning(f"Claiming job by {worker} failed: {e}")
+                job = None
+            if job is None:
+                stopped.wait(poll_interval)
+                continue
+
+            cls.run_job(job)
+            tasks += 1
+        connections.close_all()
+
+    def _spawn(self) -> multiprocessing.Process:
+        connections.close_all()  # forked child must not reuse parent's connections
+        child = multiprocessing.Process(
+            target=self.child_main, args=(self._stopped, self.max_tasks_per_child, self.poll_interval),
+            name='aws-worker')
+        child.start()
+        self._children[child.pid] = child
+        return child
+
+    def _reap(self):
+        for pid, child in list(self._children.items()):
+            if child.is_alive():
+                continue
+            child.join()
+            del self._children[pid]
+            if child.exitcode != 0:
+                released = AWSJobQueue.release_worker(
+                    self.get_worker_name(pid), f'Worker exited with code {child.exitcode}')
+                logger.warning(f"Worker {pid} exited with code {child.exitcode}, {released} jobs released")
+
+    def _kill_stalled(self):
+        # Hung job keeps its worker alive, e.g. it has exceeded max runtime. Killed worker's job is released by reap
+        workers = {self.get_worker_name(pid): child for pid, child in self._children.items()}
+        for job in AWSJobQueue.get_stalled_jobs().filter(worker__in=list(workers)):
+            logger.warning(f"Job {job.pk} {job.process_name} of worker {job.worker} is stalled, killing worker")
+            workers[job.worker].kill()
+
+    def _maintain(self):
+        try:
+            AWSJobQueue.heartbeat_queued()
+            self._kill_stalled()
+            if recovered := AWSJobQueue.recover_stalled():
+                logger.warning(f"{recovered} stalled jobs recovered")
+        except DatabaseError as e:
+            logger.warning(f"Maintaining job queue failed: {e}")
+
+    def stop(self, *_):
+        self._stopped.set()
+
+    def shutdown(self):
+        for child in self._children.values():
+            child.join(self.shutdown_timeout)
+        for pid, child in self._children.items():
+            if child.is_alive():
+                child.kill()
+                child.join()
+                AWSJobQueue.release_worker(self.get_worker_name(pid), 'Worker killed on shutdown')
+        self._children.clear()
+
+    def run(self, iterations: Optional[int] = None):
+        """
+        Runs pool until stopped by signal, or for specified number of poll intervals
+        """
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        logger.info(f"Worker pool of {self.workers} started")
+
+        while not self._stopped.is_set() and (iterations is None or iterations > 0):
+            self._reap()
+            while len(self._children) < self.workers:
+                self._spawn()
+            self._maintain()
+            self._stopped.wait(self.poll_interval)
+            iterations = iterations if iterations is None else iterations - 1
+
+        self._stopped.set()
+        self.shutdown()
+        logger.info("Worker pool stopped")
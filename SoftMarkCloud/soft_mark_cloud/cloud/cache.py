@@ -1,14 +1,25 @@
 import json
-from typing import Optional, Union
+from typing import Any, Optional, Union
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Model
 
+from soft_mark_cloud.codec import Payload
 from soft_mark_cloud.models import User
+from soft_mark_cloud.cloud.memory_cache import ReadThroughCache
 
 
 class CloudCache:
     CacheModel = Model
+    read_cache = ReadThroughCache('cloud_cache')  # decoded data grouped by cache class and user
+
+    @classmethod
+    def get_group(cls, user: User) -> str:
+        return f'{cls.__name__}:{user.pk}'
+
+    @classmethod
+    def invalidate(cls, user: User, version: Any = None):
+        cls.read_cache.invalidate(cls.get_group(user), version)
 
     @classmethod
     def get_cache(cls, user: User) -> Optional[CacheModel]:
@@ -26,7 +37,7 @@ class CloudCache:
         Saves cache for specified user
         """
         if isinstance(data, dict):
-            data = json.dumps(data, indent=4)
+            data = Payload.dumps(data)
 
         if cache := cls.get_cache(user):
             cache.data_json = data
@@ -36,7 +47,9 @@ class CloudCache:
                 data_json=data
             )
 
-        return cache.save()
+        saved = cache.save()
+        cls.invalidate(user, cache.updated_at)
+        return saved
 
     @classmethod
     def clear_cache(cls, user: User):
@@ -45,23 +58,28 @@ class CloudCache:
         """
         if cache := cls.get_cache(user):
             cache.delete()
+            cls.invalidate(user)
 
     @classmethod
     def get_cache_data_json(cls, user: User) -> Optional[str]:
         """
         Gets aws cache data json for specified user
         """
-        if cache := cls.get_cache(user):
-            return cache.data_json
+        if data := cls.get_cache_data(user):
+            return json.dumps(data, indent=4)
         else:
             return 'No data'
 
+    @classmethod
+    def _load_cache_data(cls, user: User):
+        if cache := cls.get_cache(user):
+            return cache.data, len(cache.data_json)
+        return {}, 0
+
     @classmethod
     def get_cache_data(cls, user: User) -> dict:
         """
-        Gets aws cache data json for specified user
+        Gets aws cache data json for specified user. Unchanged data is read from memory and is shared, don`t
+        mutate it
         """
-        if cache := cls.get_cache(user):
-            return cache.data
-        else:
-            return {}
+        return cls.read_cache.get(cls.get_group(user), 'data', lambda: cls._load_cache_data(user))
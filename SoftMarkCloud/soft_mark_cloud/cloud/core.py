@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import AsyncIterator
 
 from soft_mark_cloud.models import User
 
@@ -18,6 +19,9 @@ class CloudClient:
     def __init__(self, credentials: Credentials):
         self.credentials = credentials
 
+    async def collect_all_async(self):
+        raise NotImplementedError('Can`t call abstract method collect_all_async')
+
 
 class CloudCollector:
     """
@@ -26,6 +30,9 @@ class CloudCollector:
     def collect_all(self):
         pass
 
+    def collect_all_async(self) -> AsyncIterator:
+        raise NotImplementedError('Can`t call abstract method collect_all_async')
+
 
 @dataclass
 class DeploySettings:
@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class ProcessLRU:
+    """
+    Thread safe LRU of decoded values bounded by total size of values. Size of value is estimated by caller,
+    usually as size of its encoded payload
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        if size > self.max_size:
+            return  # would evict everything else
+
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self.size -= previous[1]
+            self._entries[key] = (value, size)
+            self.size += size
+
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ReadThroughCache:
+    """
+    Read-through cache of decoded database payloads.
+
+    Values are grouped (e.g. by user), every group has version token in Django cache which writers replace with
+    row `updated_at` after saving rows of group. Decoded values are kept in per-process LRU under (group, key,
+    version), so repeat reads of unchanged group cost a single cache lookup and neither touch database nor decode
+    payload. All caches of process share one LRU bounded by `READ_CACHE_MAX_SIZE` unless own LRU is given.
+    Background processes write in separate processes, so `CACHES` must be shared by them and web workers.
+
+    Examples
+    --------
+    >>> statuses = ReadThroughCache('status')
+    >>> statuses.get(user.pk, 'aws_collector', lambda: load_status(user))
+    >>> statuses.invalidate(user.pk, version=status.updated_at)
+    """
+    default_max_size = 64 * 1024 * 1024  # bytes
+
+    _shared_lru: Optional[ProcessLRU] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, namespace: str, lru: ProcessLRU = None):
+        self.namespace = namespace
+        self._lru = lru
+
+    @classmethod
+    def get_shared_lru(cls) -> ProcessLRU:
+        with cls._shared_lock:
+            if ReadThroughCache._shared_lru is None:
+                ReadThroughCache._shared_lru = ProcessLRU(
+                    getattr(settings, 'READ_CACHE_MAX_SIZE', cls.default_max_size))
+            return ReadThroughCache._shared_lru
+
+    @property
+    def lru(self) -> ProcessLRU:
+        if self._lru is None:
+            self._lru = self.get_shared_lru()
+        return self._lru
+
+    def version_key(self, group: Hashable) -> str:
+        return f'soft_mark_cloud:{self.namespace}:{group}:version'
+
+    def get_version(self, group: Hashable) -> str:
+        key = self.version_key(group)
+        if (version := cache.get(key)) is None:
+            # Unknown version, e.g. token is evicted. Value is loaded from database under a new one
+            cache.add(key, f'{time.time_ns()}', timeout=None)
+            version = cache.get(key)
+        return version
+
+    def get(self, group: Hashable, key: Hashable, load: Callable[[], Tuple[Any, int]]) -> Any:
+        """
+        Gets value from LRU or loads it with `load` which returns (value, size). Returned value is shared, so
+        callers must not mutate it
+        """
+        lru_key = (self.namespace, group, key, self.get_version(group))
+        if (value := self.lru.get(lru_key, self)) is not self:
+            return value
+
+        value, size = load()
+        self.lru.put(lru_key, value, size)
+        return value
+
+    def _set_version(self, group: Hashable, version: Any = None):
+        version = f'{time.time_ns()}' if version is None else f'{version}'
+        cache.set(self.version_key(group), version, timeout=None)
+
+    def invalidate(self, group: Hashable, version: Any = None):
+        """
+        Replaces version of group after write. It's replaced once more on commit, since readers may reload
+        previous rows meanwhile
+        """
+        self._set_version(group, version)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._set_version(group))
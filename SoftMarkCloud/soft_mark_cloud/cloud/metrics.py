@@ -0,0 +1,217 @@
+import os
+import json
+import math
+import time
+import threading
+from logging import getLogger
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.db import DatabaseError, connection, transaction
+
+from soft_mark_cloud.models import MetricSeries
+
+
+logger = getLogger(__name__)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metric:
+    """
+    Abstract process local metric family
+    """
+    kind = None
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        MetricsRegistry.register(self)
+
+    @staticmethod
+    def make_labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def pop_samples(self) -> Dict[Labels, Tuple[float, float, List[int]]]:
+        """
+        Pops accumulated (count, sum, buckets) samples per labels
+        """
+        raise NotImplementedError('Can`t call abstract method pop_samples')
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = self.make_labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def pop_samples(self) -> Dict[Labels, Tuple[float, float, List[int]]]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return {labels: (value, 0, []) for labels, value in values.items()}
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, buckets: List[float]):
+        super().__init__(name, description)
+        self.buckets = sorted(buckets)
+        self._values: Dict[Labels, Tuple[int, float, List[int]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.make_labels(labels)
+        with self._lock:
+            count, total, buckets = self._values.get(key) or (0, 0.0, [0] * (len(self.buckets) + 1))
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            buckets[index] += 1
+            self._values[key] = (count + 1, total + value, buckets)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """
+        Observes duration of block execution. Adds `status` label, `done` or `failed`
+        """
+        started_at = time.perf_counter()
+        status = 'failed'
+        try:
+            yield
+            status = 'done'
+        finally:
+            self.observe(time.perf_counter() - started_at, status=status, **labels)
+
+    def pop_samples(self) -> Dict[Labels, Tuple[float, float, List[int]]]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+
+class MetricsRegistry:
+    """
+    Registry of metric families.
+
+    Metrics are accumulated in process memory and flushed into database, so metrics of background
+    collection processes are exposed by web process too. Background processes flush on finish, web process
+    flushes every `flush_interval` seconds from flusher thread, so scrapes only read database.
+    """
+    flush_interval = 30  # seconds
+
+    _metrics: Dict[str, Metric] = {}
+    _flusher: Optional[threading.Thread] = None
+    _flusher_lock = threading.Lock()
+
+    @classmethod
+    def register(cls, metric: Metric):
+        cls._metrics[metric.name] = metric
+
+    @classmethod
+    def flush(cls):
+        """
+        Adds accumulated samples of this process to database series
+        """
+        for metric in cls._metrics.values():
+            if not (samples := metric.pop_samples()):
+                continue
+
+            with transaction.atomic():
+                for labels, (count, total, buckets) in samples.items():
+                    series, _ = MetricSeries.objects.select_for_update().get_or_create(
+                        name=metric.name,
+                        labels_json=json.dumps(labels),
+                        defaults={'kind': metric.kind})
+                    stored = json.loads(series.buckets_json) if series.buckets_json else [0] * len(buckets)
+                    series.count += count
+                    series.total += total
+                    series.buckets_json = json.dumps([a + b for a, b in zip(stored, buckets)]) if buckets else None
+                    series.save()
+
+    @classmethod
+    def _flush_periodically(cls, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                cls.flush()
+            except DatabaseError as e:
+                logger.warning(f"Flushing metrics failed: {e}")
+            finally:
+                connection.close()  # thread's own connection
+
+    @classmethod
+    def start_flusher(cls, interval: float = None):
+        """
+        Starts daemon thread flushing samples of this process periodically, if it isn't running yet
+        """
+        with cls._flusher_lock:
+            if cls._flusher is not None and cls._flusher.is_alive():
+                return
+            cls._flusher = threading.Thread(
+                target=cls._flush_periodically, args=(interval or cls.flush_interval,), name='metrics-flusher',
+                daemon=True)
+            cls._flusher.start()
+
+    @classmethod
+    def _restart_flusher(cls):
+        # Threads don't survive fork, e.g. of preloaded web server workers
+        cls._flusher_lock = threading.Lock()
+        if cls._flusher is not None:
+            cls.start_flusher()
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        def escape(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        pairs = [*labels, extra] if extra else labels
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in pairs) + '}'
+
+    @classmethod
+    def render(cls) -> str:
+        """
+        Renders all database series in Prometheus text format
+        """
+        series_by_name: Dict[str, List[MetricSeries]] = {}
+        for series in MetricSeries.objects.order_by('name', 'labels_json'):
+            series_by_name.setdefault(series.name, []).append(series)
+
+        lines = []
+        for name, series_list in series_by_name.items():
+            metric = cls._metrics.get(name)
+            kind = series_list[0].kind
+            if metric:
+                lines.append(f'# HELP {name} {metric.description}')
+            lines.append(f'# TYPE {name} {kind}')
+
+            for series in series_list:
+                labels = tuple(tuple(pair) for pair in json.loads(series.labels_json))
+                if kind == 'counter':
+                    lines.append(f'{name}{cls._format_labels(labels)} {series.count}')
+                    continue
+
+                bounds = [*metric.buckets, math.inf] if metric else []
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, json.loads(series.buckets_json or '[]')):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f'{name}_bucket{cls._format_labels(labels, ("le", le))} {cumulative}')
+                lines.append(f'{name}_sum{cls._format_labels(labels)} {series.total}')
+                lines.append(f'{name}_count{cls._format_labels(labels)} {int(series.count)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+os.register_at_fork(after_in_child=MetricsRegistry._restart_flusher)
+
+
+collection_run_duration = Histogram(
+    'collection_run_duration_seconds',
+    'Duration of background collection runs',
+    buckets=[1, 5, 10, 30, 60, 120, 300, 600, 1800])
@@ -0,0 +1,161 @@
+import json
+import lzma
+import zlib
+import base64
+from logging import getLogger
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+
+logger = getLogger(__name__)
+
+
+class PayloadCodec:
+    """
+    Encodes payload into text column value. Every value starts with codec header, e.g. `z1:`
+    """
+    name = ''
+    header = ''
+    json_based = True  # encodes compact JSON text of data, see `encode_json`
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def dumps(self, data: Any) -> str:
+        return self.encode_json(json.dumps(data, separators=(',', ':')))
+
+    def encode_json(self, payload: str) -> str:
+        """
+        Encodes data already serialized into compact JSON
+        """
+        raise NotImplementedError('Can`t call abstract method encode_json')
+
+    def loads(self, payload: str) -> Any:
+        raise NotImplementedError('Can`t call abstract method loads')
+
+
+class JSONCodec(PayloadCodec):
+    name = 'json'
+    header = 'j1:'
+
+    def encode_json(self, payload: str) -> str:
+        return payload
+
+    def loads(self, payload: str) -> Any:
+        return json.loads(payload)
+
+
+class ZlibCodec(PayloadCodec):
+    name = 'zlib'
+    header = 'z1:'
+    level = 6
+
+    def encode_json(self, payload: str) -> str:
+        return base64.b64encode(zlib.compress(payload.encode(), self.level)).decode('ascii')
+
+    def loads(self, payload: str) -> Any:
+        return json.loads(zlib.decompress(base64.b64decode(payload)))
+
+
+class LZMACodec(PayloadCodec):
+    name = 'lzma'
+    header = 'x1:'
+
+    def encode_json(self, payload: str) -> str:
+        return base64.b64encode(lzma.compress(payload.encode())).decode('ascii')
+
+    def loads(self, payload: str) -> Any:
+        return json.loads(lzma.decompress(base64.b64decode(payload)))
+
+
+class MsgpackCodec(PayloadCodec):
+    name = 'msgpack'
+    header = 'm1:'
+    json_based = False
+
+    @property
+    def available(self) -> bool:
+        return msgpack is not None
+
+    def dumps(self, data: Any) -> str:
+        return base64.b64encode(msgpack.packb(data)).decode('ascii')
+
+    def loads(self, payload: str) -> Any:
+        return msgpack.unpackb(base64.b64decode(payload))
+
+
+class Payload:
+    """
+    Versioned encoding of JSON-like payloads stored in text columns (cached data, process details).
+
+    Codec is picked by `PAYLOAD_CODEC` setting, payloads smaller than `PAYLOAD_COMPRESS_MIN_SIZE` are kept as
+    compact JSON since compression doesn't pay off there. Header of stored value tells which codec decodes it,
+    values without header are legacy indented JSON.
+
+    Examples
+    --------
+    >>> Payload.dumps({'a': 1}, codec='json')
+    'j1:{"a":1}'
+    >>> Payload.loads('j1:{"a":1}')
+    {'a': 1}
+    """
+    codecs: Dict[str, PayloadCodec] = {
+        codec.name: codec for codec in (JSONCodec(), ZlibCodec(), LZMACodec(), MsgpackCodec())
+    }
+    headers: Dict[str, PayloadCodec] = {codec.header: codec for codec in codecs.values()}
+    header_length = 3
+
+    default_codec = 'zlib'
+    compress_min_size = 1024
+
+    @classmethod
+    def get_codec(cls, codec: str = None) -> PayloadCodec:
+        name = codec or getattr(settings, 'PAYLOAD_CODEC', cls.default_codec)
+        if (payload_codec := cls.codecs.get(name)) is None or not payload_codec.available:
+            logger.warning(f"Payload codec {name} is not available, falling back to {cls.default_codec}")
+            return cls.codecs[cls.default_codec]
+        return payload_codec
+
+    @classmethod
+    def dumps(cls, data: Any, codec: str = None) -> str:
+        min_size = getattr(settings, 'PAYLOAD_COMPRESS_MIN_SIZE', cls.compress_min_size) if codec is None else 0
+        payload_codec = cls.get_codec(codec)
+
+        # Data is serialized once, JSON text built for size check is what JSON based codecs compress
+        if payload_codec.json_based:
+            payload = cls.codecs[JSONCodec.name].dumps(data)
+            if len(payload) < min_size:
+                return JSONCodec.header + payload
+            return payload_codec.header + payload_codec.encode_json(payload)
+
+        payload = payload_codec.dumps(data)
+        if len(payload) < min_size:
+            return JSONCodec.header + cls.codecs[JSONCodec.name].dumps(data)
+        return payload_codec.header + payload
+
+    @classmethod
+    def loads(cls, payload: str) -> Any:
+        if (codec := cls.headers.get(payload[:cls.header_length])) is None:
+            return json.loads(payload)  # legacy value
+        return codec.loads(payload[cls.header_length:])
+
+    @classmethod
+    def loads_memoized(cls, instance: Any, field_name: str) -> Optional[Any]:
+        """
+        Decodes payload field of model instance once. Decoded value is reused until field is reassigned, so
+        callers must not mutate it
+        """
+        payload = getattr(instance, field_name)
+        memo_name = f'_{field_name}_decoded'
+        memo = instance.__dict__.get(memo_name)
+        if memo is None or memo[0] is not payload:
+            memo = (payload, cls.loads(payload) if payload else None)
+            instance.__dict__[memo_name] = memo
+        return memo[1]
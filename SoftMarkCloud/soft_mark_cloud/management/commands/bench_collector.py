@@ -0,0 +1,129 @@
+import json
+import time
+import resource
+from collections import Counter
+from typing import Any, Callable, Dict
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test.utils import setup_databases, teardown_databases
+
+from soft_mark_cloud.models import User
+from soft_mark_cloud.cloud.aws import AWSCreds
+from soft_mark_cloud.cloud.aws.billing import AWSBilling
+from soft_mark_cloud.cloud.aws.cache import AWSCache
+from soft_mark_cloud.cloud.aws.collector import AWSCollector
+from soft_mark_cloud.cloud.aws.fake import FakeAWS, SyntheticAccount
+from soft_mark_cloud.cloud.aws.prices import AWSPriceCache
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks collector, billing and cache save/load against synthetic in-process AWS account. '
+            'Runs against throwaway database, no real AWS calls are made')
+
+    credentials = AWSCreds(aws_access_key_id='AKIABENCHMARK', aws_secret_access_key='benchmark')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', type=int, default=2, help='Number of regions with resources')
+        parser.add_argument('--vpcs', type=int, default=2, help='Number of VPCs per region')
+        parser.add_argument('--subnets', type=int, default=2, help='Number of subnets per VPC')
+        parser.add_argument('--instances', type=int, default=5, help='Number of instances per subnet')
+        parser.add_argument('--buckets', type=int, default=3, help='Number of S3 buckets')
+        parser.add_argument('--objects', type=int, default=100, help='Number of objects per bucket')
+        parser.add_argument('--latency', type=float, default=20, help='Latency of every API call, ms')
+        parser.add_argument('--jitter', type=float, default=0, help='Max random latency added to every call, ms')
+        parser.add_argument('--serial', action='store_true', help='Collect units one by one')
+        parser.add_argument('--json', action='store_true', help='Print report as JSON')
+
+    @staticmethod
+    def peak_rss_mb() -> float:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # kilobytes on Linux
+
+    def measure(self, fake: FakeAWS, func: Callable[[], Any]) -> Dict[str, Any]:
+        calls_before = Counter(fake.calls)
+        started_at = time.perf_counter()
+        func()
+        wall_time = time.perf_counter() - started_at
+
+        calls = fake.calls - calls_before
+        return {
+            'wall_time': round(wall_time, 3),
+            'api_calls': sum(calls.values()),
+            'api_calls_by_operation': {f'{s}:{o}': n for (s, o), n in sorted(calls.items())},
+            'peak_rss_mb': self.peak_rss_mb()
+        }
+
+    def run_benchmark(self, fake: FakeAWS, parallel: bool) -> Dict[str, Any]:
+        phases, results = {}, {}
+
+        def _collect():
+            collector = AWSCollector(self.credentials, parallel=parallel)
+            results['data'] = collector.collect_all()
+            results['failures'] = [f.json for f in collector.failures]
+
+        # Cold run fills regions index and prices cache, warm run shows steady state refresh
+        phases['collect_cold'] = self.measure(fake, _collect)
+        phases['collect_warm'] = self.measure(fake, _collect)
+        phases['billing'] = self.measure(fake, lambda: AWSBilling(self.credentials).build_billing_data())
+
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark', email='benchmark@example.com')
+            phases['cache_save'] = self.measure(fake, lambda: AWSCache.save_cache(user, results['data']))
+            phases['cache_load'] = self.measure(fake, lambda: AWSCache.get_cache_data(user))
+            serialized_size = len(AWSCache.get_cache_data_json(user).encode())
+            transaction.set_rollback(True)
+
+        return {
+            'account': fake.account.description,
+            'latency_ms': fake.latency * 1000,
+            'parallel': parallel,
+            'phases': phases,
+            'serialized_size': serialized_size,
+            'failures': results['failures']
+        }
+
+    def write_report(self, report: Dict[str, Any]):
+        self.stdout.write(f'Account: {report["account"]}')
+        self.stdout.write(f'Latency: {report["latency_ms"]:g} ms, parallel: {report["parallel"]}\n\n')
+
+        self.stdout.write(f'{"phase":<14}{"wall, s":>10}{"API calls":>12}{"peak RSS, MB":>15}')
+        for name, phase in report['phases'].items():
+            self.stdout.write(
+                f'{name:<14}{phase["wall_time"]:>10.3f}{phase["api_calls"]:>12}{phase["peak_rss_mb"]:>15.1f}')
+
+        self.stdout.write(f'\nSerialized cache size: {report["serialized_size"]} bytes\n\n')
+
+        self.stdout.write('API calls by operation:')
+        for name, phase in report['phases'].items():
+            if calls := phase['api_calls_by_operation']:
+                self.stdout.write(f'  {name}: ' + ', '.join(f'{op}={n}' for op, n in calls.items()))
+
+        if report['failures']:
+            self.stdout.write(self.style.WARNING(f'\n{len(report["failures"])} units failed:'))
+            for failure in report['failures']:
+                self.stdout.write(f'  {failure["region"] or "global"}:{failure["service"]} {failure["error"]}')
+
+    def handle(self, *args, **options):
+        account = SyntheticAccount(
+            regions=options['regions'],
+            vpcs=options['vpcs'],
+            subnets=options['subnets'],
+            instances=options['instances'],
+            buckets=options['buckets'],
+            objects=options['objects'])
+        fake = FakeAWS(account, latency=options['latency'] / 1000, jitter=options['jitter'] / 1000)
+
+        # Process level caches would make results depend on previous runs
+        AWSPriceCache.clear()
+
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+        try:
+            with fake.install():
+                report = self.run_benchmark(fake, parallel=not options['serial'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=4))
+        else:
+            self.write_report(report)
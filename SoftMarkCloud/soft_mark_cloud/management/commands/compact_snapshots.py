@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from soft_mark_cloud.cloud.aws.snapshots import AWSSnapshotDao
+from soft_mark_cloud.models import AWSInventorySnapshot, User
+
+
+class Command(BaseCommand):
+    help = 'Compacts old inventory snapshot keyframes into deltas. Meant to be run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days', type=int, default=None,
+            help='Delete snapshots older than specified number of days, history is kept forever by default')
+
+    def handle(self, *args, keep_days: int = None, **options):
+        user_ids = AWSInventorySnapshot.objects.values_list('user_id', flat=True).distinct()
+        for user in User.objects.filter(pk__in=user_ids):
+            expired = 0
+            if keep_days is not None:
+                expired = AWSSnapshotDao.expire(user, datetime.now(tz=timezone.utc) - timedelta(days=keep_days))
+            compacted = AWSSnapshotDao.compact(user)
+            self.stdout.write(f'{user}: {compacted} keyframes compacted, {expired} snapshots deleted')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from soft_mark_cloud.cloud.aws.price_list import AWSPriceListIndex
+
+
+class Command(BaseCommand):
+    help = 'Ingests AWS bulk price list offer file (JSON or CSV) into local prices index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('service_code', help='Offer service code, e.g. AmazonEC2 or AmazonS3')
+        parser.add_argument('path', help='Path to local offer file')
+
+    def handle(self, *args, service_code: str, path: str, **options):
+        if path.endswith('.csv'):
+            iter_offer = AWSPriceListIndex.iter_csv_offer
+        elif path.endswith('.json'):
+            iter_offer = AWSPriceListIndex.iter_json_offer
+        else:
+            raise CommandError('Offer file must be .csv or .json')
+
+        with open(path, 'r', encoding='utf-8', newline='') as offer_file:
+            count = AWSPriceListIndex.ingest(service_code, iter_offer(offer_file))
+
+        self.stdout.write(self.style.SUCCESS(f'Ingested {count} {service_code} prices from {path}'))
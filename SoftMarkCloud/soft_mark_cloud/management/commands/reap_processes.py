@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+
+
+class Command(BaseCommand):
+    help = 'Marks background processes which have missed heartbeats as failed. Meant to be run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=int, default=None,
+            help=f'Seconds without heartbeat, defaults to {AWSStatusDao.heartbeat_timeout}')
+        parser.add_argument('--dry-run', action='store_true', help='Only list orphaned processes')
+
+    def handle(self, *args, timeout: int = None, dry_run: bool = False, **options):
+        statuses = AWSStatusDao.get_expired_statuses(timeout).select_related('user')
+        for status in statuses:
+            last_seen = status.heartbeat_at or status.created_at
+            self.stdout.write(
+                f'{status.process_name} of {status.user}: last heartbeat at {last_seen:%Y-%m-%d %H:%M:%S}')
+
+        if dry_run:
+            self.stdout.write(f'{len(statuses)} orphaned processes found')
+            return
+
+        # Interrupted collection runs are resumed from unfinished units by the next refresh
+        count = AWSStatusDao.fail_statuses(statuses)
+        self.stdout.write(self.style.SUCCESS(f'{count} orphaned processes marked as failed'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from soft_mark_cloud.cloud.aws.workers import AWSWorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Runs pool of worker processes executing queued collection, billing and deploy jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+        parser.add_argument(
+            '--max-tasks-per-child', type=int, default=100,
+            help='Jobs run by worker process before it is replaced with fresh one')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Seconds between queue polls')
+        parser.add_argument(
+            '--shutdown-timeout', type=float, default=30,
+            help='Seconds running jobs are waited for on shutdown before workers are killed')
+
+    def handle(
+            self, *args, workers: int = 2, max_tasks_per_child: int = 100, poll_interval: float = 1,
+            shutdown_timeout: float = 30, **options
+    ):
+        self.stdout.write(f'Starting {workers} workers, press Ctrl+C to stop')
+        AWSWorkerPool(
+            workers=workers, max_tasks_per_child=max_tasks_per_child, poll_interval=poll_interval,
+            shutdown_timeout=shutdown_timeout
+        ).run()
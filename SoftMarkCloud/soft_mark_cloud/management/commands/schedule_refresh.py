@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from soft_mark_cloud.models import AWSCredentials
+from soft_mark_cloud.cloud.aws.core import AWSCreds
+from soft_mark_cloud.cloud.aws.jobs import AWSJobQueue
+from soft_mark_cloud.cloud.aws.billing import AWSBilling
+from soft_mark_cloud.cloud.aws.collector import AWSCollector
+
+
+class Command(BaseCommand):
+    help = ('Queues collection and billing of every user with credentials at scheduled priority, '
+            'so they yield to refreshes requested from pages. Meant to be run periodically')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-billing', action='store_true', help='Only queue collection')
+
+    def handle(self, *args, no_billing: bool = False, **options):
+        priority = AWSJobQueue.Priority.SCHEDULED
+        count = 0
+        for credentials in AWSCredentials.objects.select_related('user'):
+            creds = AWSCreds.from_model(credentials)
+            AWSCollector(credentials=creds).run_async(credentials.user, priority=priority)
+            if not no_billing:
+                AWSBilling(creds).run_async(credentials.user, priority=priority)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Refresh of {count} users queued'))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0005_awsprocessstatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSRegionActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_id', models.CharField(max_length=32)),
+                ('region', models.CharField(max_length=32)),
+                ('active', models.BooleanField(default=False)),
+                ('error_code', models.CharField(max_length=64, null=True)),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('account_id', 'region')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0006_awsregionactivity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('service_code', models.CharField(max_length=64)),
+                ('region', models.CharField(max_length=32)),
+                ('filters_json', models.TextField()),
+                ('price', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0007_awsprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSPriceListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_code', models.CharField(max_length=64)),
+                ('sku', models.CharField(max_length=64)),
+                ('region_code', models.CharField(max_length=32, null=True)),
+                ('product_family', models.CharField(max_length=128, null=True)),
+                ('usage_type', models.CharField(max_length=128, null=True)),
+                ('instance_type', models.CharField(max_length=64, null=True)),
+                ('operating_system', models.CharField(max_length=64, null=True)),
+                ('tenancy', models.CharField(max_length=32, null=True)),
+                ('capacity_status', models.CharField(max_length=64, null=True)),
+                ('pre_installed_sw', models.CharField(max_length=64, null=True)),
+                ('storage_class', models.CharField(max_length=128, null=True)),
+                ('unit', models.CharField(max_length=32)),
+                ('price', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='awspricelistitem',
+            index=models.Index(fields=['service_code', 'instance_type', 'operating_system'], name='soft_mark_c_service_0a0810_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='awspricelistitem',
+            index=models.Index(fields=['service_code', 'product_family'], name='soft_mark_c_service_67a623_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='awspricelistitem',
+            unique_together={('service_code', 'sku')},
+        ),
+    ]
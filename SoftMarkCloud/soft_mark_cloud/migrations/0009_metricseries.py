@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0008_awspricelistitem_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('labels_json', models.CharField(max_length=512)),
+                ('kind', models.CharField(max_length=16)),
+                ('count', models.FloatField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('buckets_json', models.TextField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('name', 'labels_json')},
+            },
+        ),
+    ]
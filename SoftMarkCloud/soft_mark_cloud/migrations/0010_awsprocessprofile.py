@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 21:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0009_metricseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSProcessProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stats', models.BinaryField()),
+                ('summary', models.TextField()),
+                ('duration', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to='soft_mark_cloud.awsprocessstatus')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 21:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0010_awsprocessprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSCollectionUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128)),
+                ('service_name', models.CharField(max_length=64)),
+                ('region', models.CharField(max_length=32, null=True)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(null=True)),
+                ('data_json', models.TextField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='units', to='soft_mark_cloud.awsprocessstatus')),
+            ],
+            options={
+                'unique_together': {('status', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0011_awscollectionunit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsprocessstatus',
+            name='heartbeat_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-17 21:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0012_awsprocessstatus_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSInventoryResource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arn', models.CharField(max_length=2048)),
+                ('resource_type', models.CharField(max_length=64)),
+                ('service_name', models.CharField(max_length=64)),
+                ('region', models.CharField(max_length=32, null=True)),
+                ('parent_arn', models.CharField(max_length=2048, null=True)),
+                ('parent_field', models.CharField(max_length=128, null=True)),
+                ('position', models.IntegerField(default=0)),
+                ('state', models.CharField(max_length=64, null=True)),
+                ('cost', models.FloatField(null=True)),
+                ('attributes_json', models.TextField()),
+                ('collected_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='awsinventoryresource',
+            index=models.Index(fields=['user', 'region', 'resource_type'], name='soft_mark_c_user_id_1dba42_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='awsinventoryresource',
+            index=models.Index(fields=['user', 'region', 'service_name'], name='soft_mark_c_user_id_ef30b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='awsinventoryresource',
+            index=models.Index(fields=['user', 'parent_arn'], name='soft_mark_c_user_id_a1b08c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='awsinventoryresource',
+            unique_together={('user', 'arn')},
+        ),
+    ]
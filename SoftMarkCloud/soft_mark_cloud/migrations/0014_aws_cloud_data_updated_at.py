@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0013_aws_inventory_resource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsclouddata',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-17 21:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0014_aws_cloud_data_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsinventoryresource',
+            name='content_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='AWSInventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyframe', models.BooleanField(default=False)),
+                ('resources', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AWSInventoryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arn', models.CharField(max_length=2048)),
+                ('change', models.CharField(choices=[('added', 'Added'), ('updated', 'Updated'), ('removed', 'Removed'), ('present', 'Present')], max_length=16)),
+                ('content_hash', models.CharField(max_length=64, null=True)),
+                ('content_json', models.TextField(null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='soft_mark_cloud.awsinventorysnapshot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='awsinventorysnapshot',
+            index=models.Index(fields=['user', 'created_at'], name='soft_mark_c_user_id_29df76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='awsinventorychange',
+            index=models.Index(fields=['arn', 'snapshot'], name='soft_mark_c_arn_5ad706_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-17 21:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0015_aws_inventory_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AWSJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process_name', models.CharField(max_length=256)),
+                ('dedupe_key', models.CharField(max_length=256)),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('payload_json', models.TextField(null=True)),
+                ('profile', models.BooleanField(null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=1)),
+                ('error', models.TextField(null=True)),
+                ('worker', models.CharField(max_length=128, null=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('status', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='soft_mark_cloud.awsprocessstatus')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='awsjob',
+            index=models.Index(fields=['state', 'available_at'], name='soft_mark_c_state_84d7e6_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='awsjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('state__in', ['queued', 'running'])), fields=('dedupe_key',), name='unique_active_aws_job'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-17 21:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0016_aws_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsjob',
+            name='cost',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='awsjob',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('scheduled', 'Scheduled')], default='interactive', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='awsjob',
+            name='virtual_finish',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='awsjob',
+            index=models.Index(fields=['state', 'virtual_finish'], name='soft_mark_c_state_27a6a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='awsjob',
+            index=models.Index(fields=['started_at'], name='soft_mark_c_started_108f53_idx'),
+        ),
+    ]
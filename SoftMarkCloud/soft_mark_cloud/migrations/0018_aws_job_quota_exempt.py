@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0017_aws_job_fair_queuing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsjob',
+            name='quota_exempt',
+            field=models.BooleanField(default=False),
+        ),
+    ]
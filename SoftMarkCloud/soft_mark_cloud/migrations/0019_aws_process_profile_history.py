@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_owner(apps, schema_editor):
+    AWSProcessProfile = apps.get_model('soft_mark_cloud', 'AWSProcessProfile')
+    for profile in AWSProcessProfile.objects.select_related('status'):
+        profile.user_id = profile.status.user_id
+        profile.process_name = profile.status.process_name
+        profile.save(update_fields=['user', 'process_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soft_mark_cloud', '0018_aws_job_quota_exempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsprocessprofile',
+            name='user',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='awsprocessprofile',
+            name='process_name',
+            field=models.CharField(default='', max_length=256),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='awsprocessprofile',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='awsprocessprofile',
+            name='status',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profiles',
+                to='soft_mark_cloud.awsprocessstatus'),
+        ),
+        migrations.AddIndex(
+            model_name='awsprocessprofile',
+            index=models.Index(fields=['user', 'process_name', 'created_at'], name='soft_mark_c_user_id_7fdab5_idx'),
+        ),
+    ]
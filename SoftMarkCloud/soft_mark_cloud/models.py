@@ -1,8 +1,12 @@
 import json
+from typing import Optional
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+from soft_mark_cloud.codec import Payload
+
 
 class User(AbstractUser):
     age = models.IntegerField(null=True, blank=True)
@@ -21,10 +25,77 @@ class AWSCredentials(models.Model):
 class AWSCloudData(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     data_json = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, null=True)
 
     @property
     def data(self):
-        return json.loads(self.data_json)
+        return Payload.loads_memoized(self, 'data_json')
+
+
+class AWSInventoryResource(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    arn = models.CharField(max_length=2048)
+    resource_type = models.CharField(max_length=64)
+    service_name = models.CharField(max_length=64)
+    region = models.CharField(max_length=32, null=True)  # None for global services
+
+    parent_arn = models.CharField(max_length=2048, null=True)
+    parent_field = models.CharField(max_length=128, null=True)  # parent field resource is listed in
+    position = models.IntegerField(default=0)  # position in parent field
+
+    state = models.CharField(max_length=64, null=True)
+    cost = models.FloatField(null=True)  # per month
+    attributes_json = models.TextField()
+    content_hash = models.CharField(max_length=64, default='')  # changes when resource changes
+
+    collected_at = models.DateTimeField()
+
+    @property
+    def attributes(self) -> list:
+        return json.loads(self.attributes_json)
+
+    class Meta:
+        unique_together = ('user', 'arn')
+        indexes = [
+            models.Index(fields=['user', 'region', 'resource_type']),
+            models.Index(fields=['user', 'region', 'service_name']),
+            models.Index(fields=['user', 'parent_arn']),
+        ]
+
+
+class AWSInventorySnapshot(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    keyframe = models.BooleanField(default=False)  # holds every resource, not only changed ones
+    resources = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+
+class AWSInventoryChange(models.Model):
+    class Change(models.TextChoices):
+        ADDED = 'added'
+        UPDATED = 'updated'
+        REMOVED = 'removed'
+        PRESENT = 'present'  # unchanged resource of keyframe
+
+    snapshot = models.ForeignKey(AWSInventorySnapshot, on_delete=models.CASCADE, related_name='changes')
+    arn = models.CharField(max_length=2048)
+    change = models.CharField(max_length=16, choices=Change.choices)
+    content_hash = models.CharField(max_length=64, null=True)
+    content_json = models.TextField(null=True)
+
+    @property
+    def content(self) -> Optional[dict]:
+        return Payload.loads_memoized(self, 'content_json')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['arn', 'snapshot']),
+        ]
 
 
 class AWSProcessStatus(models.Model):
@@ -38,12 +109,170 @@ class AWSProcessStatus(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    heartbeat_at = models.DateTimeField(null=True)
 
     @property
     def details(self):
-        if self.details_json:
-            return json.loads(self.details_json)
-        return None
+        return Payload.loads_memoized(self, 'details_json')
 
     class Meta:
         unique_together = ('user', 'process_name')
+
+
+class AWSCollectionUnit(models.Model):
+    class State(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    status = models.ForeignKey(AWSProcessStatus, on_delete=models.CASCADE, related_name='units')
+    key = models.CharField(max_length=128)
+    service_name = models.CharField(max_length=64)
+    region = models.CharField(max_length=32, null=True)
+
+    state = models.CharField(max_length=16, choices=State.choices, default=State.PENDING)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(null=True)
+    data_json = models.TextField(null=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def data(self):
+        return Payload.loads_memoized(self, 'data_json')
+
+    class Meta:
+        unique_together = ('status', 'key')
+
+
+class AWSJob(models.Model):
+    class State(models.TextChoices):
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    class Priority(models.TextChoices):
+        INTERACTIVE = 'interactive'  # requested by user from page
+        SCHEDULED = 'scheduled'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    process_name = models.CharField(max_length=256)
+    status = models.ForeignKey(AWSProcessStatus, on_delete=models.CASCADE, null=True, related_name='jobs')
+    dedupe_key = models.CharField(max_length=256)  # single queued or running job per key
+
+    state = models.CharField(max_length=16, choices=State.choices, default=State.QUEUED)
+    priority = models.CharField(max_length=16, choices=Priority.choices, default=Priority.INTERACTIVE)
+    cost = models.FloatField(default=0)  # estimated run seconds
+    virtual_finish = models.FloatField(default=0)  # fair queuing finish tag, jobs are claimed in its order
+    quota_exempt = models.BooleanField(default=False)  # neither counts to nor is limited by user quota
+    payload_json = models.TextField(null=True)
+    profile = models.BooleanField(null=True)  # None is up to settings
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=1)
+    error = models.TextField(null=True)
+    worker = models.CharField(max_length=128, null=True)  # host:pid of worker process running job
+
+    available_at = models.DateTimeField(default=timezone.now)  # retries are delayed
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    @property
+    def payload(self):
+        return Payload.loads_memoized(self, 'payload_json')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(state__in=['queued', 'running']),
+                name='unique_active_aws_job'),
+        ]
+        indexes = [
+            models.Index(fields=['state', 'available_at']),
+            models.Index(fields=['state', 'virtual_finish']),
+            models.Index(fields=['started_at']),
+        ]
+
+
+class AWSProcessProfile(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    process_name = models.CharField(max_length=256)
+    # Profile outlives status of its run, which is replaced by the next run
+    status = models.ForeignKey(AWSProcessStatus, on_delete=models.SET_NULL, null=True, related_name='profiles')
+
+    stats = models.BinaryField()  # marshaled pstats, same format as `pstats.Stats.dump_stats`
+    summary = models.TextField()
+    duration = models.FloatField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'process_name', 'created_at']),
+        ]
+
+
+class AWSRegionActivity(models.Model):
+    account_id = models.CharField(max_length=32)
+    region = models.CharField(max_length=32)
+
+    active = models.BooleanField(default=False)
+    error_code = models.CharField(max_length=64, null=True)
+
+    checked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('account_id', 'region')
+
+
+class AWSPrice(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    service_code = models.CharField(max_length=64)
+    region = models.CharField(max_length=32)
+    filters_json = models.TextField()
+
+    price = models.FloatField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class AWSPriceListItem(models.Model):
+    service_code = models.CharField(max_length=64)
+    sku = models.CharField(max_length=64)
+
+    region_code = models.CharField(max_length=32, null=True)
+    product_family = models.CharField(max_length=128, null=True)
+    usage_type = models.CharField(max_length=128, null=True)
+    instance_type = models.CharField(max_length=64, null=True)
+    operating_system = models.CharField(max_length=64, null=True)
+    tenancy = models.CharField(max_length=32, null=True)
+    capacity_status = models.CharField(max_length=64, null=True)
+    pre_installed_sw = models.CharField(max_length=64, null=True)
+    storage_class = models.CharField(max_length=128, null=True)
+
+    unit = models.CharField(max_length=32)
+    price = models.FloatField()
+
+    class Meta:
+        unique_together = ('service_code', 'sku')
+        indexes = [
+            models.Index(fields=['service_code', 'instance_type', 'operating_system']),
+            models.Index(fields=['service_code', 'product_family']),
+        ]
+
+
+class MetricSeries(models.Model):
+    name = models.CharField(max_length=128)
+    labels_json = models.CharField(max_length=512)
+    kind = models.CharField(max_length=16)
+
+    count = models.FloatField(default=0)
+    total = models.FloatField(default=0)
+    buckets_json = models.TextField(null=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('name', 'labels_json')
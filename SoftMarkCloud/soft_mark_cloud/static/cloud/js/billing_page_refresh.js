@@ -1,5 +1,4 @@
-setTimeout(function() {
-  if ($('.loader').length !== 0) {
+// Billing graph is rendered by server, page is reloaded once refresh is finished
+watchProcessStatus(null, function() {
     location.reload();
-  }
-}, 5000);
+});
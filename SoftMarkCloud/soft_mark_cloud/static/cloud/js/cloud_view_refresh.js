@@ -1,5 +1,31 @@
-setTimeout(function() {
-  if ($('.loader').length !== 0) {
+// Partial data is published while refreshing, inventory is reloaded in place as units complete
+let completed = null;
+
+function renderProgress(progress) {
+    let text = "Refreshing... " + progress.completed + " of " + progress.total + " collected";
+    if (progress.failed) {
+        text += ", " + progress.failed + " failed";
+    }
+    document.getElementById("refresh-progress").textContent = text + ". Showing partial data.";
+}
+
+function reloadInventory() {
+    const params = new URLSearchParams(location.search);
+    params.set("fragment", "");
+    fetch(location.pathname + "?" + params.toString())
+        .then(response => response.text())
+        .then(html => document.getElementById("cloud-view-data").innerHTML = html);
+}
+
+watchProcessStatus(function(status) {
+    if (!status.progress || !status.progress.total) {
+        return;
+    }
+    renderProgress(status.progress);
+    if (completed !== null && status.progress.completed !== completed) {
+        reloadInventory();
+    }
+    completed = status.progress.completed;
+}, function() {
     location.reload();
-  }
-}, 30000);
+});
@@ -1,5 +1,16 @@
-setTimeout(function() {
-  if ($('#deploy-form').length === 0) {
+// Deploy steps are marked done in place, page is reloaded once deploy is finished
+watchProcessStatus(function(status) {
+    if (!status.steps) {
+        return;
+    }
+    for (const [step, done] of Object.entries(status.steps)) {
+        const element = document.querySelector('[data-step="' + CSS.escape(step) + '"]');
+        if (done && element && !element.classList.contains("alert-success")) {
+            element.className = "alert alert-success";
+            element.style.display = "";
+            element.textContent = step + " ✔";
+        }
+    }
+}, function() {
     location.reload();
-  }
-}, 30000);
+});
@@ -0,0 +1,20 @@
+// Subscribes to status stream of background process rendered in progress in #process-status.
+// onStatus is called with every status change, onFinished once process is done or failed
+function watchProcessStatus(onStatus, onFinished) {
+    const element = document.getElementById("process-status");
+    if (!element || !element.dataset.streamUrl) {
+        return;
+    }
+
+    const source = new EventSource(element.dataset.streamUrl);
+    source.addEventListener("status", function(message) {
+        const status = JSON.parse(message.data);
+        if (onStatus) {
+            onStatus(status);
+        }
+        if (status.finished) {
+            source.close();
+            onFinished(status);
+        }
+    });
+}
@@ -1,3 +1,57 @@
-from django.test import TestCase
+import io
+import json
+import random
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from soft_mark_cloud.cloud.aws.price_list import JSONStreamReader
+
+
+class JSONStreamReaderTests(SimpleTestCase):
+    seed = 2023
+    documents = 50
+
+    @classmethod
+    def random_value(cls, rnd: random.Random, depth: int = 0):
+        kind = rnd.choice(['int', 'float', 'literal', 'str'] + (['dict', 'list'] if depth < 4 else []))
+        if kind == 'int':
+            return rnd.randint(-10 ** 12, 10 ** 12)
+        if kind == 'float':
+            return rnd.choice([rnd.uniform(-1e3, 1e3), rnd.uniform(-1, 1) * 10 ** rnd.randint(-300, 300)])
+        if kind == 'literal':
+            return rnd.choice([True, False, None])
+        if kind == 'str':
+            return ''.join(rnd.choice('ab"\\\n/ü{}[],:') for _ in range(rnd.randint(0, 12)))
+        if kind == 'list':
+            return [cls.random_value(rnd, depth + 1) for _ in range(rnd.randint(0, 5))]
+        return {f'k{i}': cls.random_value(rnd, depth + 1) for i in range(rnd.randint(0, 5))}
+
+    @staticmethod
+    def walk(reader: JSONStreamReader, skipped: set) -> dict:
+        res = {}
+        for key in reader.iter_object():
+            if key in skipped:
+                reader.skip_value()
+            else:
+                res[key] = reader.read_value()
+        return res
+
+    def test_any_chunk_size(self):
+        rnd = random.Random(self.seed)
+        for _ in range(self.documents):
+            doc = {f'k{i}': self.random_value(rnd) for i in range(rnd.randint(1, 8))}
+            text = json.dumps(doc, indent=rnd.choice([None, 1]), ensure_ascii=rnd.choice([True, False]))
+            skipped = {k for k in doc if rnd.random() < 0.3}
+            expected = {k: v for k, v in doc.items() if k not in skipped}
+
+            for chunk_size in range(1, 12):
+                reader = JSONStreamReader(io.StringIO(text))
+                reader.chunk_size = chunk_size
+                self.assertEqual(self.walk(reader, skipped), expected, f'chunk size {chunk_size}: {text}')
+
+    def test_truncated_numbers(self):
+        for text in ['{"a": 1.5e-7}', '{"a": -12.25}', '{"a": 1E+300, "b": 0.5}']:
+            for chunk_size in range(1, len(text)):
+                reader = JSONStreamReader(io.StringIO(text))
+                reader.chunk_size = chunk_size
+                self.assertEqual(self.walk(reader, set()), json.loads(text), f'chunk size {chunk_size}: {text}')
@@ -9,5 +9,7 @@ urlpatterns = [
     path('billing/', views.billing, name='billing'),
     path('register/', views.sign_up, name='register'),
     path('login/', views.sign_in, name='login'),
-    path('logout/', views.logout_user, name='logout')
+    path('logout/', views.logout_user, name='logout'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('status_stream/<str:process_name>/', views.status_stream, name='status_stream')
 ]
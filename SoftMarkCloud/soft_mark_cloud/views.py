@@ -1,11 +1,15 @@
-import time
-from typing import Any
+import hmac
+from typing import Any, Optional
 
-from django.http import JsonResponse
-from django.core.exceptions import ObjectDoesNotExist
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
 from datetime import datetime
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -13,14 +17,24 @@ from rest_framework.permissions import IsAuthenticated
 from soft_mark_cloud.cloud.aws import AWSCreds
 from soft_mark_cloud.cloud.aws.cache import AWSCache
 from soft_mark_cloud.cloud.aws.collector import AWSCollector
-from soft_mark_cloud.cloud.aws.status import AWSStatusDao
+from soft_mark_cloud.cloud.aws.status import AWSStatusDao, AWSStatusStream
 from soft_mark_cloud.cloud.aws.deploy.terraform import AWSDeployer
 from soft_mark_cloud.cloud.aws.billing import AWSBilling
+from soft_mark_cloud.cloud.metrics import MetricsRegistry
 
 from soft_mark_cloud.forms import SignUpForm, LoginForm, AWSCredentialsForm, TerraformSettingsForm
 from soft_mark_cloud.models import AWSCredentials
 
 
+def profile_requested(request) -> Optional[bool]:
+    """
+    Staff users can profile background run with `profile` query flag. Otherwise profiling is up to settings
+    """
+    if 'profile' in request.GET and request.user.is_staff:
+        return True
+    return None
+
+
 @api_view(['GET'])
 def index(request):
     current_user = request.user
@@ -137,28 +151,32 @@ def cloud_view(request):
     Out:
     <Response [200]>
     """
-    REFRESH_TIME_LIMIT = 180  # 3 minutes
-
     def _check_refreshing():
         if refresh_status_ := AWSStatusDao.get_status(request.user, AWSCollector.process_name):
-            refresh_status_ = AWSStatusDao.check_expired(refresh_status_, REFRESH_TIME_LIMIT)
+            refresh_status_ = AWSStatusDao.check_expired(refresh_status_)
             return not (refresh_status_.failed or refresh_status_.done)
         return False
 
     def _render(
             resp: Any, status_code: int, refreshing_: bool = False, failed_: bool = False, done_: bool = False,
-            started_at: datetime = None
+            started_at: datetime = None, progress: dict = None, regions: list = None, region: str = None
     ):
         if started_at:
             started_at = started_at.strftime("%d-%m-%Y %H:%M:%S UTC")
-        return render(request, 'cloud_view.html',
+        # Fragment is inventory alone, page updates it in place while refreshing
+        template = 'includes/cloud_view_content.html' if 'fragment' in request.GET else 'cloud_view.html'
+        return render(request, template,
                       {
                           'response': response,
                           'status': status_code,
                           'refreshing': refreshing_,
                           'failed': failed_,
                           'done': done_,
-                          'started_at': started_at
+                          'started_at': started_at,
+                          'progress': progress,
+                          'regions': regions,
+                          'region': region,
+                          'process_name': AWSCollector.process_name
                       })
 
     try:
@@ -174,19 +192,21 @@ def cloud_view(request):
 
     refreshing = _check_refreshing()
     if 'refresh' in request.GET and not refreshing:
-        AWSCollector(credentials=creds).run_async(user=request.user)
-        time.sleep(2)  # Let update refresh status
+        AWSCollector(credentials=creds).run_async(user=request.user, profile=profile_requested(request))
         return redirect('cloud_view')
 
-    aws_data = AWSCache.get_cache_data(request.user) or AWSCollector.empty_data
+    # Only requested region is loaded, `global` stands for global services
+    region = request.GET.get('region') or None
+    aws_data = AWSCache.get_cache_data(request.user, region=region) or AWSCollector.empty_data
     response, status = aws_data, 200
 
     refresh_status = AWSStatusDao.get_status(request.user, AWSCollector.process_name)
 
-    kwargs = {}
+    kwargs = {'regions': AWSCache.get_regions(request.user), 'region': region}
     if refresh_status:
         kwargs.update({
-            'failed_': refresh_status.failed, 'done_': refresh_status.done, 'started_at': refresh_status.created_at})
+            'failed_': refresh_status.failed, 'done_': refresh_status.done, 'started_at': refresh_status.created_at,
+            'progress': (refresh_status.details or {}).get('progress')})
 
     return _render(
         response, status, refreshing, **kwargs)
@@ -195,7 +215,6 @@ def cloud_view(request):
 @api_view(['GET', 'POST', 'DELETE'])
 @login_required
 def deployer(request):
-    DEPLOY_TIME_LIMIT = 600  # 10 minutes
     user = request.user
 
     try:
@@ -210,8 +229,12 @@ def deployer(request):
         if not deploy_status:
             resp = {'status': 204, 'form': TerraformSettingsForm()}
         else:
-            deploy_status = AWSStatusDao.check_expired(deploy_status, DEPLOY_TIME_LIMIT)
-            resp = {'status': 200, 'deploy_details': deploy_status.details, 'expired': deploy_status.failed}
+            deploy_status = AWSStatusDao.check_expired(deploy_status)
+            resp = {
+                'status': 200,
+                'deploy_details': deploy_status.details,
+                'expired': deploy_status.failed,
+                'process_name': AWSDeployer.process_name}
 
     elif request.method == 'POST':
         if deploy_status:
@@ -219,9 +242,8 @@ def deployer(request):
 
         form = TerraformSettingsForm(request.POST)
         if form.is_valid():
-            settings = form.gen(creds)
-            AWSDeployer(settings).deploy_async(user)
-            time.sleep(3)  # Let update deploy status
+            terraform_settings = form.gen(creds)
+            AWSDeployer(terraform_settings).deploy_async(user, profile=profile_requested(request))
             return redirect('deployer')
         else:
             resp = {'status': 204, 'form': form}
@@ -239,8 +261,6 @@ def deployer(request):
 def billing(request):
     user = request.user
 
-    BILLING_TIME_LIMIT = 60
-
     try:
         creds = AWSCreds.from_model(
             model_instance=AWSCredentials.objects.get(user=user))
@@ -255,19 +275,59 @@ def billing(request):
     if request.method == 'GET':
         # Refresh
         if 'refresh' in request.GET and not refreshing:
-            AWSBilling(creds).run_async(user=request.user)
-            time.sleep(2)  # Let update refresh status
+            AWSBilling(creds).run_async(user=request.user, profile=profile_requested(request))
             return redirect('billing')
 
         # Get
         if not billing_status:
             resp = {'status': 200, 'resp': aws_billing.empty_billing_data}
         else:
-            billing_status = AWSStatusDao.check_expired(billing_status, BILLING_TIME_LIMIT)
+            billing_status = AWSStatusDao.check_expired(billing_status)
             resp = {
                 'status': 200,
                 'resp': billing_status.details,
                 'expired': billing_status.failed,
-                'refreshing': refreshing}
+                'refreshing': refreshing,
+                'process_name': AWSBilling.process_name}
 
         return render(request, 'billing.html', resp)
+
+
+async def status_stream(request, process_name: str):
+    """
+    Streams status changes of user process as Server-Sent Events. Open streams only wait without holding threads
+    when served by ASGI server, WSGI server gets short sync stream, browser reconnects once it ends
+    """
+    if process_name not in (AWSCollector.process_name, AWSBilling.process_name, AWSDeployer.process_name):
+        raise Http404('Unknown process')
+
+    # `login_required` doesn't support async views, user is loaded from session by sync code
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+
+    # Sync iterator is preferred by response, so stream is passed as one of either kind
+    if isinstance(request, ASGIRequest):
+        stream = aiter(AWSStatusStream(user, process_name))
+    else:
+        stream = iter(AWSStatusStream(user, process_name, timeout=AWSStatusStream.sync_timeout))
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don`t let proxy buffer events
+    return response
+
+
+def metrics_allowed(request) -> bool:
+    """
+    Metrics are exposed to staff users and to scrapers sending `Authorization: Bearer <METRICS_TOKEN>` header
+    """
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(MetricsRegistry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')